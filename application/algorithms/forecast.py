@@ -0,0 +1,177 @@
+import os
+import time
+import hashlib
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from statsmodels.tsa.holtwinters import ExponentialSmoothing
+from core.base import Schedule, HOURS_PER_DAY
+
+
+SEASON = 7 * HOURS_PER_DAY  # weekly seasonality of the hourly prices, independent of the run length
+
+
+class Forecaster:
+    name = None
+
+    def __init__(self, season=SEASON):
+        self.season = season
+
+    def fit(self, prices):
+        return self
+
+    def predict(self, steps):
+        raise NotImplementedError
+
+    def _cycles(self, prices, count=None):
+        """Last complete seasons of the history as a (cycles, season) matrix"""
+        cycles = len(prices) // self.season
+        if count is not None:
+            cycles = min(cycles, count)
+        return np.asarray(prices[len(prices) - cycles * self.season:], dtype=float).reshape(cycles, self.season)
+
+    def _phase(self, steps):
+        return np.arange(steps) % self.season  # the seasons end with the last fitted hour
+
+
+class SeasonalNaive(Forecaster):  # same hour of the last season
+    name = 'seasonal_naive'
+
+    def fit(self, prices):
+        self._last = self._cycles(prices, 1)[0]
+        return self
+
+    def predict(self, steps):
+        return self._last[self._phase(steps)]
+
+
+class RollingSeasonalMean(Forecaster):  # mean of the same hour over the last seasons
+    name = 'seasonal_mean'
+
+    def __init__(self, season=SEASON, window=2):
+        super().__init__(season)
+        self.window = window
+
+    def fit(self, prices):
+        self._profile = self._cycles(prices, self.window).mean(axis=0)
+        return self
+
+    def predict(self, steps):
+        return self._profile[self._phase(steps)]
+
+
+class FastExponentialSmoothing(Forecaster):
+    """
+    Exponential smoothing of every hour of the season across seasons, all hours at once,
+    plus a level shifted by the smoothed error of the last day.
+    """
+    name = 'fast_smoothing'
+
+    def __init__(self, season=SEASON, alpha=0.5, beta=0.3):
+        super().__init__(season)
+        self.alpha = alpha
+        self.beta = beta
+
+    def fit(self, prices):
+        cycles = self._cycles(prices)
+        weights = self.alpha * (1 - self.alpha) ** np.arange(len(cycles) - 1, -1, -1)
+        weights[0] = (1 - self.alpha) ** (len(cycles) - 1)  # oldest season starts the recursion
+        self._profile = weights @ cycles
+
+        recent = np.asarray(prices[-HOURS_PER_DAY:], dtype=float)
+        error = recent - self._profile[-len(recent):]
+        decay = self.beta * (1 - self.beta) ** np.arange(len(error) - 1, -1, -1)
+        self._level = decay @ error
+        return self
+
+    def predict(self, steps):
+        return self._profile[self._phase(steps)] + self._level
+
+
+class HoltWinters(Forecaster):  # additive trend and season, fitted by statsmodels
+    name = 'holt_winters'
+
+    def fit(self, prices):
+        model = ExponentialSmoothing(pd.Series(prices, dtype=float), trend='add', seasonal='add',
+                                     seasonal_periods=self.season)
+        self._fit = model.fit()
+        return self
+
+    def predict(self, steps):
+        return np.asarray(self._fit.forecast(steps=steps))
+
+
+FORECASTERS = {model.name: model for model in (SeasonalNaive, RollingSeasonalMean, FastExponentialSmoothing,
+                                                HoltWinters)}
+
+
+def get_forecaster(name, **kwargs) -> Forecaster:
+    if name not in FORECASTERS:
+        raise KeyError(f'unknown forecaster {name}, choose from {list(FORECASTERS)}')
+    return FORECASTERS[name](**kwargs)
+
+
+def backtest(prices, origins, names=None):
+    """
+    Replay the price history: at every origin fit on prices[:origin] and forecast the rest of that day.
+    Return the MAE and the mean fit/predict latency of every model.
+    """
+    prices = np.asarray(prices, dtype=float)
+    report = []
+    for name in names or FORECASTERS:
+        errors, fit_time, predict_time = [], 0, 0
+        for origin in origins:
+            steps = HOURS_PER_DAY - origin % HOURS_PER_DAY
+            start = time.perf_counter()
+            model = get_forecaster(name).fit(prices[:origin])
+            fit_time += time.perf_counter() - start
+            start = time.perf_counter()
+            forecast = model.predict(steps)
+            predict_time += time.perf_counter() - start
+            errors.append(np.abs(forecast - prices[origin:origin + steps]))
+        report.append({
+            'model': name,
+            'mae': np.concatenate(errors).mean(),
+            'fit_ms': fit_time / len(origins) * 1000,
+            'predict_ms': predict_time / len(origins) * 1000,
+        })
+
+    return pd.DataFrame(report).sort_values('mae')
+
+
+def _forecast_day(job):
+    history, hour, name = job
+    offset = hour + 1
+    history = np.asarray(history, dtype=float)
+    if offset == HOURS_PER_DAY:
+        return history[-offset:]
+    return np.concatenate((history[-offset:], get_forecaster(name).fit(history).predict(HOURS_PER_DAY - offset)))
+
+
+def precompute_forecasts(external, name='holt_winters', workers=None, cache_dir=None):
+    """
+    Rolling day-ahead price forecasts of every simulated hour, (hours x 24), fitted in parallel processes.
+    Row h is what DSM needs at hour h: the actual prices of the day so far, then the forecast.
+    """
+    jobs = []
+    datetime = Schedule()
+    while True:
+        jobs.append((external.get_history_data(datetime), datetime.hour, name))
+        if datetime.has_next() is False:
+            break
+        datetime.next()
+
+    file_path = None
+    if cache_dir:
+        digest = hashlib.sha1(np.asarray(jobs[-1][0], dtype=float).tobytes()).hexdigest()[:16]
+        file_path = os.path.join(cache_dir, f'{name}_{len(jobs)}_{digest}.npy')
+        if os.path.exists(file_path):
+            return np.load(file_path)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        table = np.array(list(executor.map(_forecast_day, jobs, chunksize=4)))
+    if file_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        np.save(file_path, table)
+
+    return table
@@ -1,19 +1,14 @@
-import pandas as pd
-from statsmodels.tsa.holtwinters import ExponentialSmoothing
 from sklearn.linear_model import LinearRegression
+from application.algorithms.forecast import get_forecaster
 
 
-def predict_external_price(hours, prices, next_hours):
-    if len(hours) != len(prices) or len(hours) == 0:
+def predict_external_price(prices, next_hours, model='holt_winters'):
+    if len(prices) == 0:
         return None
     if next_hours == 0:
         return []
 
-    data = pd.DataFrame({'hour': hours, 'price': prices})
-    model = ExponentialSmoothing(data['price'], trend='add', seasonal='add', seasonal_periods=24 * 7)
-    fit = model.fit()
-    forecast = fit.forecast(steps=next_hours)
-    return forecast.tolist()
+    return get_forecaster(model).fit(prices).predict(next_hours).tolist()
 
 
 def predict_supply_demand(pre_ratio, pre_prices, curr_ratio, curr_prices, curr_round):
@@ -31,3 +26,18 @@ def predict_supply_demand(pre_ratio, pre_prices, curr_ratio, curr_prices, curr_r
 
         next_price = price_model.predict([[next_ratio]])[0]
         curr_prices[curr_round] = next_price
+
+
+def has_converged(pre_price, price, volume, total_volume, price_tolerance, volume_tolerance, spread=None):
+    """
+    price: clearing price of the round, the mid quote of the book when nothing cleared.
+    spread: best ask minus best bid of the residual book, positive when it cannot cross.
+    """
+    if pre_price is None:
+        return False
+    price_change = abs(price - pre_price) / abs(pre_price) if pre_price != 0 else abs(price)
+    if volume == 0:  # users re-price every round, stop only if the book cannot cross and the quotes settled
+        return spread is not None and spread > 0 and price_change <= price_tolerance
+    if total_volume == 0:
+        return False
+    return price_change <= price_tolerance and volume / total_volume <= volume_tolerance
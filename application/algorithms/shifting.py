@@ -0,0 +1,36 @@
+import numpy as np
+from core.base import HOURS_PER_DAY
+from core.device import Device
+
+
+class LoadShifter:
+    """
+    Shared cheapest-hours plan of the deferrable (ONCE) devices.
+    The k cheapest hours of the day are planned once per forecast day for every charge hours k (1..24),
+    a device buys 1 / (planned hours still ahead) of its remaining demand in a planned hour,
+    so the planned hours together cover the whole demand. Users only look up the share of their devices.
+    """
+    def __init__(self):
+        self._planned = None  # (charge hours, hour of day)
+        self._hour = None
+        self._shares = np.zeros(HOURS_PER_DAY)
+
+    def update(self, prices, hour):
+        if self._planned is None or hour <= self._hour:  # a new day
+            self._planned = self.plan(prices, hour)
+        self._hour = hour
+        ahead = self._planned[:, hour:].sum(axis=1)
+        self._shares = np.where(self._planned[:, hour], 1 / np.maximum(ahead, 1), 0)
+
+        return self._shares
+
+    @staticmethod
+    def plan(prices, hour):
+        prices = np.array(prices, dtype=float)
+        prices[:hour] = np.inf  # hours already gone
+        rank = np.empty(len(prices), dtype=int)
+        rank[np.argsort(prices, kind='stable')] = np.arange(len(prices))  # ties keep the earliest hour
+        return rank[None, :] < np.arange(1, HOURS_PER_DAY + 1)[:, None]
+
+    def share(self, device: Device):
+        return self._shares[min(getattr(device, 'charge_hours', 1), HOURS_PER_DAY) - 1]
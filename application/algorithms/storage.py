@@ -0,0 +1,94 @@
+import numpy as np
+
+
+def solve_dispatch(prices, levels, step, rate, efficiency, sell_ratio, terminal_value, value=None, policy=None,
+                   start=0, stop=None):
+    """
+    Backward dynamic program over the state of charge.
+    prices: (batch, horizon) import prices, the storage sells at prices * sell_ratio.
+    value: (batch, horizon + 1, levels) value table, policy: (batch, horizon, levels) next level.
+    Stages [start, stop) are (re)solved in place, stages >= stop are reused from the given tables.
+    """
+    batch, horizon = prices.shape
+    if stop is None:
+        stop = horizon
+    if value is None:
+        value = np.zeros((batch, horizon + 1, levels))
+        policy = np.zeros((batch, horizon, levels), dtype=np.int32)
+        value[:, horizon] = terminal_value
+
+    reach = int(rate // step)  # most levels moved within one stage
+    offsets = np.arange(-reach, reach + 1)
+    target = np.arange(levels)[:, None] + offsets[None, :]  # target[i, k] = level reached from i by offsets[k]
+    infeasible = (target < 0) | (target >= levels)
+    target = np.clip(target, 0, levels - 1)
+    gain = np.where(offsets > 0, -offsets * step / efficiency, -offsets * step * efficiency * sell_ratio)
+    rows = np.arange(levels)
+
+    for t in range(stop - 1, start - 1, -1):
+        q = prices[:, t, None, None] * gain + value[:, t + 1][:, target]
+        q[:, infeasible] = -np.inf
+        best = q.argmax(axis=2)
+        policy[:, t] = target[rows, best]
+        value[:, t] = np.take_along_axis(q, best[..., None], axis=2)[..., 0]
+
+    return value, policy
+
+
+class ESSDispatcher:
+    """
+    Look-ahead charge/discharge schedule of an energy storage system.
+    The schedule is rolled forward every hour, only the stages whose prices changed are solved again.
+    """
+    def __init__(self, cap, rate=None, efficiency=0.95, sell_ratio=0.9, levels=101):
+        self.cap = cap
+        self.rate = cap * 0.25 if rate is None else rate
+        self.efficiency = efficiency
+        self.sell_ratio = sell_ratio
+        self.levels = levels
+        self.step = cap / (levels - 1)
+        self._prices = None
+        self._value = None
+        self._policy = None
+        self._solved_from = None
+        self.solved_stages = 0
+
+    def reset(self):
+        self._prices = None
+        self._value = None
+        self._policy = None
+        self._solved_from = None
+
+    def plan(self, prices, hour, energy):
+        """
+        Return the grid side energy for the given hour, positive to charge and negative to discharge.
+        prices: forecast import prices of the whole horizon, index hour is the current hour.
+        """
+        prices = np.asarray(prices, dtype=float)
+        horizon = len(prices)
+        if self._prices is None or len(self._prices) != horizon or hour < self._solved_from:
+            self.reset()
+            self._solve(prices, hour, horizon)
+        else:
+            changed = np.flatnonzero(~np.isclose(prices[hour:], self._prices[hour:]))
+            if len(changed) > 0:
+                self._solve(prices, hour, hour + changed[-1] + 1)
+
+        curr_level = int(round(min(max(energy, 0), self.cap) / self.step))
+        next_level = int(self._policy[0, hour, curr_level])
+        if next_level > curr_level:
+            return (next_level - curr_level) * self.step / self.efficiency
+        return -(curr_level - next_level) * self.step * self.efficiency
+
+    def _solve(self, prices, start, stop):
+        if self._value is None:
+            terminal_price = prices[start:].min() * self.sell_ratio * self.efficiency
+            terminal_value = np.arange(self.levels) * self.step * terminal_price
+        else:
+            terminal_value = None
+        self._value, self._policy = solve_dispatch(
+            prices[None, :], self.levels, self.step, self.rate, self.efficiency, self.sell_ratio, terminal_value,
+            self._value, self._policy, start, stop)
+        self._prices = prices.copy()
+        self._solved_from = start
+        self.solved_stages += stop - start
@@ -7,6 +7,8 @@ class TradeMode(Enum):
     MARKET = 'market'
     FROM_EXTERNAL = 'from_external'
     TO_ESS = 'to_ess'
+    GRID_TO_ESS = 'grid_to_ess'  # storage charged from the grid, not internal supply
+    TO_EXTERNAL = 'to_external'
 
 
 @dataclass(frozen=True)
@@ -50,5 +52,8 @@ class MarketInformation:
         self.external_price_hour = 0
         self.external_price_day = None
         self.trade_list = []
+        self.load_shares = None  # charge hours -> share of the remaining demand to buy this hour
+        self.price_floor = 0  # export tariff, nobody sells below it
+        self.price_cap = None  # import tariff, nobody buys above it
         self.round_number = 1
         self.last = False
@@ -0,0 +1,123 @@
+import numpy as np
+from collections import defaultdict
+from core.base import Schedule
+from application.base import Trade, TradeMode
+
+
+EPSILON = 1e-9  # pieces of a split fill below this are dropped
+
+
+class FeederClearing:
+    """
+    Two tier clearing of the order books. The bids of every feeder are first matched among its own users,
+    the residual bids are pooled into one bid per (feeder, price level) for the central matcher,
+    and the central fills are split back onto the devices of each pool pro rata.
+    """
+    def __init__(self, feeders: dict):
+        self.feeders = feeders  # user id -> feeder, a user without a feeder is a feeder of its own
+        self.book_size = np.zeros(2, dtype=int)  # bids of the device books and of the central books, so far
+
+    @staticmethod
+    def from_config(config: dict):
+        return FeederClearing({user_id.strip(): feeder for feeder, users in config.items()
+                               for user_id in users.split(',')})
+
+    def feeder(self, user_id):
+        return self.feeders.get(user_id, user_id)
+
+    def clear(self, match, datetime: Schedule, supply_list: list[Trade], demand_list: list[Trade], last: bool,
+              max_price=None):
+        """
+        match is TradingPlatform.match_trades. Return the device level trades and residual bids like
+        TradingPlatform.clear.
+        """
+        supply_by_feeder, demand_by_feeder = defaultdict(list), defaultdict(list)
+        for supply in supply_list:
+            supply_by_feeder[self.feeder(supply.supplier_id)].append(supply)
+        for demand in demand_list:
+            demand_by_feeder[self.feeder(demand.consumer_id)].append(demand)
+
+        # net within the feeders, only bids that cross trade locally
+        trade_list, pool_supply, pool_demand, members = [], [], [], {}
+        for feeder in sorted(supply_by_feeder.keys() | demand_by_feeder.keys()):
+            supply = sorted(supply_by_feeder[feeder], key=lambda x: x.price)
+            demand = sorted(demand_by_feeder[feeder], key=lambda x: x.price, reverse=True)
+            if supply and demand:
+                trade_list.extend(match(datetime, supply, demand, False, max_price))
+            pool_supply.extend(self._pool(feeder, supply, True, members))
+            pool_demand.extend(self._pool(feeder, demand, False, members))
+        self.book_size += (len(supply_list) + len(demand_list), len(pool_supply) + len(pool_demand))
+
+        # central book of the pooled residuals
+        pool_supply.sort(key=lambda x: x.price)
+        pool_demand.sort(key=lambda x: x.price, reverse=True)
+        for fill in match(datetime, pool_supply, pool_demand, last, max_price):
+            trade_list.extend(self._split(fill, members[fill.supplier_device_id], members[fill.consumer_device_id]))
+
+        supply_list = sorted(self._residual(pool_supply, members, True), key=lambda x: x.price)
+        demand_list = sorted(self._residual(pool_demand, members, False), key=lambda x: x.price, reverse=True)
+        return trade_list, supply_list, demand_list
+
+    @staticmethod
+    def _pool(feeder, bids: list[Trade], supply: bool, members: dict):
+        levels = defaultdict(list)
+        for bid in bids:
+            levels[bid.price].append(bid)
+        pool = []
+        for level, (price, group) in enumerate(levels.items()):
+            key = f"{feeder}/{'ask' if supply else 'bid'}{level}"
+            total = sum(bid.amount for bid in group)
+            members[key] = (group, total)
+            if supply:
+                pool.append(Trade(amount=total, price=price, supplier_id=feeder, supplier_device_id=key))
+            else:
+                pool.append(Trade(amount=total, price=price, consumer_id=feeder, consumer_device_id=key))
+        return pool
+
+    @staticmethod
+    def _split(fill: Trade, supply_members, demand_members):
+        """Device to device trades of a central fill, every member gives or takes its share of the pool"""
+        supply_list, supply_total = supply_members
+        demand_list, demand_total = demand_members
+        supply_left = [supply.amount * fill.amount / supply_total for supply in supply_list]
+        demand_left = [demand.amount * fill.amount / demand_total for demand in demand_list]
+
+        trade_list = []
+        i, j = 0, 0
+        while i < len(supply_list) and j < len(demand_list):
+            amount = min(supply_left[i], demand_left[j])
+            if amount > EPSILON:
+                trade_list.append(Trade(
+                    amount=amount,
+                    price=fill.price,
+                    supplier_id=supply_list[i].supplier_id,
+                    supplier_device_id=supply_list[i].supplier_device_id,
+                    consumer_id=demand_list[j].consumer_id,
+                    consumer_device_id=demand_list[j].consumer_device_id,
+                    mode=TradeMode.MARKET
+                ))
+            supply_left[i] -= amount
+            demand_left[j] -= amount
+            if supply_left[i] <= EPSILON:
+                i += 1
+            if demand_left[j] <= EPSILON:
+                j += 1
+
+        return trade_list
+
+    @staticmethod
+    def _residual(pool: list[Trade], members: dict, supply: bool):
+        residual = []
+        for bid in pool:
+            group, total = members[bid.supplier_device_id if supply else bid.consumer_device_id]
+            ratio = bid.amount / total
+            residual.extend(member.refresh_amount(member.amount * ratio) for member in group
+                            if member.amount * ratio > EPSILON)
+        return residual
+
+    def stats(self):
+        return {
+            'device_bids': int(self.book_size[0]),
+            'central_bids': int(self.book_size[1]),
+            'reduction': self.book_size[0] / self.book_size[1] if self.book_size[1] > 0 else 0,
+        }
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+from application.base import Trade, TradeMode
+
+
+MODES = list(TradeMode)
+
+
+class Ledger:
+    """
+    Double-entry settlement of the delivered trades into one account per participant.
+    The consumer account is debited and the supplier account credited with amount * price.
+    Postings are only buffered during a round, settle() nets them in one vectorized pass.
+    """
+    def __init__(self, size=1024):
+        self._index = {}
+        self.names = []
+        self.paid = np.zeros((size, len(MODES)))  # value debited, by trade mode
+        self.received = np.zeros((size, len(MODES)))  # value credited, by trade mode
+        self.energy_in = np.zeros(size)
+        self.energy_out = np.zeros(size)
+        self.posted = 0
+        self._debit = []
+        self._credit = []
+        self._mode = []
+        self._amount = []
+        self._price = []
+
+    def account(self, name):
+        if name in self._index:
+            return self._index[name]
+        index = len(self.names)
+        if index == len(self.energy_in):  # grow by doubling
+            self.paid = np.vstack((self.paid, np.zeros_like(self.paid)))
+            self.received = np.vstack((self.received, np.zeros_like(self.received)))
+            self.energy_in = np.concatenate((self.energy_in, np.zeros_like(self.energy_in)))
+            self.energy_out = np.concatenate((self.energy_out, np.zeros_like(self.energy_out)))
+        self._index[name] = index
+        self.names.append(name)
+
+        return index
+
+    def post(self, trade: Trade, amount):
+        self._debit.append(self.account(trade.consumer_id))
+        self._credit.append(self.account(trade.supplier_id))
+        self._mode.append(MODES.index(trade.mode))
+        self._amount.append(amount)
+        self._price.append(trade.price)
+
+    def settle(self):
+        if len(self._amount) == 0:
+            return
+        size = len(self.energy_in)
+        debit = np.asarray(self._debit)
+        credit = np.asarray(self._credit)
+        mode = np.asarray(self._mode)
+        amount = np.asarray(self._amount, dtype=float)
+        value = amount * np.asarray(self._price, dtype=float)
+
+        # net every account and mode at once
+        self.paid += np.bincount(debit * len(MODES) + mode, weights=value,
+                                 minlength=size * len(MODES)).reshape(size, len(MODES))
+        self.received += np.bincount(credit * len(MODES) + mode, weights=value,
+                                     minlength=size * len(MODES)).reshape(size, len(MODES))
+        self.energy_in += np.bincount(debit, weights=amount, minlength=size)
+        self.energy_out += np.bincount(credit, weights=amount, minlength=size)
+        self.posted += len(amount)
+        self._debit, self._credit, self._mode, self._amount, self._price = [], [], [], [], []
+
+    def balance(self):
+        size = len(self.names)
+        return self.received[:size].sum(axis=1) - self.paid[:size].sum(axis=1)
+
+    def statements(self):
+        self.settle()
+        size = len(self.names)
+        statements = pd.DataFrame({
+            'account': self.names,
+            'energy_in': self.energy_in[:size],
+            'energy_out': self.energy_out[:size],
+            'paid': self.paid[:size].sum(axis=1),
+            'received': self.received[:size].sum(axis=1),
+            'balance': self.balance(),
+        })
+        for i, mode in enumerate(MODES):
+            statements[f'paid_{mode.name.lower()}'] = self.paid[:size, i]
+
+        return statements
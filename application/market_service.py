@@ -0,0 +1,118 @@
+import time
+import asyncio
+import numpy as np
+from enum import Enum
+from core.base import Schedule
+from application.base import Trade
+from application.trading_platform import TradingPlatform
+
+
+class Side(Enum):
+    BID = 'bid'  # demand
+    ASK = 'ask'  # supply
+
+
+class MarketService:
+    """
+    Asynchronous order intake around the matching engine of TradingPlatform.
+    Orders are cleared every interval seconds, or as soon as trigger orders are pending.
+    The intake queue is bounded, submitters wait when it is full (backpressure).
+    """
+    def __init__(self, platform: TradingPlatform, interval=0.05, trigger=500, max_pending=10000):
+        self.platform = platform
+        self.interval = interval
+        self.trigger = trigger
+        self.datetime = Schedule()
+        self.trade_list = []
+        self.expired = 0  # orders left in the book when the hour is over
+        self._queue = asyncio.Queue(maxsize=max_pending)
+        self._triggered = asyncio.Event()
+        self._asks = []
+        self._bids = []
+        self._pending = []  # submit time of the orders not cleared yet
+        self._latency = []  # seconds from submission to the first clearing of an order
+        self._clearing_time = []
+        self._tasks = []
+
+    async def submit(self, side: Side, order: Trade):
+        await self._queue.put((side, order, time.perf_counter()))
+
+    def submit_nowait(self, side: Side, order: Trade):
+        self._queue.put_nowait((side, order, time.perf_counter()))  # raise asyncio.QueueFull when overloaded
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._intake()), asyncio.create_task(self._clearing())]
+
+    async def stop(self):
+        await self.flush()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def flush(self):
+        await self._queue.join()
+        self.clear()
+
+    async def advance(self, datetime: Schedule):
+        await self.flush()
+        self.expired += len(self._asks) + len(self._bids)
+        self._asks, self._bids = [], []
+        self.datetime = datetime.copy()
+
+    async def _intake(self):
+        while True:
+            side, order, submitted = await self._queue.get()
+            if side == Side.ASK:
+                self._asks.append(order)
+            else:
+                self._bids.append(order)
+            self._pending.append(submitted)
+            if len(self._pending) >= self.trigger:
+                self._triggered.set()
+            self._queue.task_done()
+
+    async def _clearing(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._triggered.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._triggered.clear()
+            self.clear()
+
+    def clear(self):
+        if len(self._pending) == 0:
+            return []
+        start = time.perf_counter()
+        self._asks.sort(key=lambda x: x.price)
+        self._bids.sort(key=lambda x: x.price, reverse=True)
+        trade_list = self.platform.match_trades(self.datetime, self._asks, self._bids, False)
+        self.platform.allocator.distribute_energy(trade_list, self.datetime)
+        self.platform.allocator.ledger.settle()  # the postings of this clearing
+        self.trade_list.extend(trade_list)
+
+        end = time.perf_counter()
+        self._clearing_time.append(end - start)
+        self._latency.extend(end - np.asarray(self._pending))
+        self._pending = []
+
+        return trade_list
+
+    def stats(self):
+        latency = np.asarray(self._latency) * 1000
+        clearing_time = np.asarray(self._clearing_time) * 1000
+        if len(latency) == 0:
+            return {'orders': 0, 'rounds': 0}
+        p50, p95, p99 = np.percentile(latency, [50, 95, 99])
+        return {
+            'orders': len(latency),
+            'rounds': len(clearing_time),
+            'trades': len(self.trade_list),
+            'expired': self.expired,
+            'latency_p50_ms': p50,
+            'latency_p95_ms': p95,
+            'latency_p99_ms': p99,
+            'clearing_p50_ms': np.percentile(clearing_time, 50),
+            'clearing_max_ms': clearing_time.max(),
+        }
@@ -0,0 +1,106 @@
+import time
+import pickle
+import numpy as np
+import pandas as pd
+from collections import defaultdict
+from core.base import Schedule, HOURS_PER_DAY
+from application.base import Trade
+
+
+class Recorder:
+    """
+    Captures the seed of a run and, for every auction round, the collected order books and the cleared trades.
+    A trace replays the matching stages of TradingPlatform without users, devices or forecasts.
+    """
+    def __init__(self, seed=None, feeders=None):
+        self.seed = seed
+        self.feeders = feeders  # user id -> feeder of the run, replays clear the same way
+        self.rounds = []
+
+    def record_books(self, datetime: Schedule, round_number, last, max_price, supply_list, demand_list):
+        self.rounds.append({
+            'index': datetime.index,
+            'round': round_number,
+            'last': last,
+            'max_price': max_price,
+            'supply': list(supply_list),
+            'demand': list(demand_list),
+            'trades': [],
+        })
+
+    def record_trades(self, trade_list: list[Trade]):
+        self.rounds[-1]['trades'] = list(trade_list)
+
+    def save(self, file_path):
+        with open(file_path, 'wb') as f:
+            pickle.dump({'seed': self.seed, 'feeders': self.feeders, 'rounds': self.rounds}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(file_path):
+        with open(file_path, 'rb') as f:
+            trace = pickle.load(f)
+        recorder = Recorder(trace['seed'], trace.get('feeders'))
+        recorder.rounds = trace['rounds']
+        return recorder
+
+
+def _flows(trade_list: list[Trade]):
+    """Amount and value of every (supplier device, consumer device) pair"""
+    flows = defaultdict(lambda: np.zeros(2))
+    for trade in trade_list:
+        flows[(trade.supplier_device_id, trade.consumer_device_id)] += (trade.amount, trade.amount * trade.price)
+    return flows
+
+
+def diff_trades(expected: list[Trade], actual: list[Trade], rtol=1e-9, atol=1e-6):
+    """
+    Differences of two clearings of the same books: per device pair amount and average price,
+    total volume and volume-weighted clearing price. Return None when they match within tolerance.
+    """
+    expected_flows, actual_flows = _flows(expected), _flows(actual)
+    pairs = sorted(expected_flows.keys() | actual_flows.keys())
+    if len(pairs) == 0:
+        return None
+    zero = np.zeros(2)
+    a = np.array([expected_flows.get(pair, zero) for pair in pairs])
+    b = np.array([actual_flows.get(pair, zero) for pair in pairs])
+    price_a = np.divide(a[:, 1], a[:, 0], out=np.zeros(len(pairs)), where=a[:, 0] > 0)
+    price_b = np.divide(b[:, 1], b[:, 0], out=np.zeros(len(pairs)), where=b[:, 0] > 0)
+
+    amount_ok = np.isclose(a[:, 0], b[:, 0], rtol=rtol, atol=atol)
+    price_ok = np.isclose(price_a, price_b, rtol=rtol, atol=atol)
+    if amount_ok.all() and price_ok.all():
+        return None
+
+    volume_a, volume_b = a[:, 0].sum(), b[:, 0].sum()
+    return {
+        'pairs': len(pairs),
+        'amount_mismatch': int((~amount_ok).sum()),
+        'price_mismatch': int((~price_ok).sum()),
+        'volume_diff': volume_b - volume_a,
+        'clearing_price_diff': (b[:, 1].sum() / volume_b if volume_b > 0 else 0) -
+                               (a[:, 1].sum() / volume_a if volume_a > 0 else 0),
+        'max_amount_diff': np.abs(a[:, 0] - b[:, 0]).max(),
+        'max_price_diff': np.abs(price_a - price_b).max(),
+    }
+
+
+def replay(recorder: Recorder, platform, rtol=1e-9, atol=1e-6):
+    """
+    Clear every captured round again with platform.clear and diff the trades against the recorded ones.
+    Return the mismatching rounds and the replay time.
+    """
+    report = []
+    elapsed = 0
+    for number, captured in enumerate(recorder.rounds):
+        datetime = Schedule(captured['index'] // HOURS_PER_DAY, captured['index'] % HOURS_PER_DAY)
+        start = time.perf_counter()
+        trade_list, _, _ = platform.clear(datetime, captured['supply'], captured['demand'], captured['last'],
+                                          captured['max_price'])
+        elapsed += time.perf_counter() - start
+        diff = diff_trades(captured['trades'], trade_list, rtol, atol)
+        if diff is not None:
+            report.append({'number': number, 'index': captured['index'], 'round': captured['round'], **diff})
+
+    return pd.DataFrame(report), elapsed
@@ -0,0 +1,119 @@
+import weakref
+import numpy as np
+from multiprocessing import shared_memory
+from core.base import Schedule, HORIZON, HOURS_PER_DAY
+
+
+# layout of one hour of the history
+VERSION, ROUND, LAST, RATIO, PRICE, FLOOR, CAP = range(7)
+DAY_PRICES = slice(7, 7 + HOURS_PER_DAY)  # external_price_day
+SHARES = slice(7 + HOURS_PER_DAY, 7 + 2 * HOURS_PER_DAY)  # load share by charge hours (1..24)
+WIDTH = 7 + 2 * HOURS_PER_DAY
+
+
+class MarketSnapshot:
+    """
+    Read-only view of one hour of the shared market history, nothing is copied.
+    The version is bumped on every publish, a reader can tell if the round has moved on.
+    """
+    def __init__(self, row):
+        self._row = row
+
+    @property
+    def version(self):
+        return int(self._row[VERSION])
+
+    @property
+    def round_number(self):
+        return int(self._row[ROUND])
+
+    @property
+    def last(self):
+        return bool(self._row[LAST])
+
+    @property
+    def supply_demand_ratio(self):
+        return self._row[RATIO]
+
+    @property
+    def price(self):
+        return self._row[PRICE]
+
+    @property
+    def price_floor(self):
+        return self._row[FLOOR]
+
+    @property
+    def price_cap(self):
+        return self._row[CAP]
+
+    @property
+    def external_price_day(self):
+        return self._row[DAY_PRICES]
+
+    def load_share(self, charge_hours):
+        return self._row[SHARES][min(charge_hours, HOURS_PER_DAY) - 1]
+
+
+class MarketHistory:
+    """
+    Market snapshots of every hour in a single (hours x fields) buffer, written by the platform only.
+    The buffer is a plain array by default. With shared=True, for multi-process runs, it lives in
+    multiprocessing.shared_memory and workers attach to it by name. close() releases the segment,
+    it is refused while snapshots of it are still held.
+    """
+    def __init__(self, horizon=HORIZON, shared=False, name=None):
+        self._shm = None
+        self._owner = name is None  # only the creator unlinks the segment by default
+        self._snapshots = weakref.WeakSet()  # handed out views into the segment
+        if shared:
+            self._shm = shared_memory.SharedMemory(name=name, create=self._owner, size=horizon * WIDTH * 8)
+            self._array = np.ndarray((horizon, WIDTH), dtype=np.float64, buffer=self._shm.buf)
+            if self._owner:
+                self._array[:] = 0
+        else:
+            self._array = np.zeros((horizon, WIDTH))
+        self._view = self._array.view()
+        self._view.flags.writeable = False  # what readers get
+
+    @property
+    def name(self):
+        return self._shm.name if self._shm is not None else None
+
+    @staticmethod
+    def attach(name, horizon=HORIZON):
+        return MarketHistory(horizon, True, name)
+
+    def publish(self, datetime: Schedule, round_number, last, ratio, price, price_floor, price_cap,
+                external_price_day, load_shares) -> MarketSnapshot:
+        row = self._array[datetime.index]
+        row[ROUND] = round_number
+        row[LAST] = last
+        row[RATIO] = ratio
+        row[PRICE] = price
+        row[FLOOR] = price_floor
+        row[CAP] = np.inf if price_cap is None else price_cap
+        row[DAY_PRICES] = external_price_day
+        row[SHARES] = load_shares
+        row[VERSION] += 1
+
+        return self.snapshot(datetime)
+
+    def snapshot(self, datetime: Schedule) -> MarketSnapshot:
+        snapshot = MarketSnapshot(self._view[datetime.index])
+        if self._shm is not None:
+            self._snapshots.add(snapshot)
+        return snapshot
+
+    def close(self, unlink=None):
+        if self._shm is None:
+            return
+        if len(self._snapshots) > 0:  # unmapping the segment under them would crash their readers
+            raise BufferError(f'{len(self._snapshots)} market snapshots are still held, drop them first')
+        if unlink is None:
+            unlink = self._owner
+        self._array = self._view = None
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+        self._shm = None
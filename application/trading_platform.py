@@ -1,25 +1,38 @@
 import copy
 import numpy as np
 from core.microgrids import Microgrids
-from core.base import Schedule
+from core.base import Schedule, HORIZON
 from application.base import Trade, TradeMode
 from application.user import User
 from application.base import MarketInformation
-from application.algorithms.market import predict_external_price, predict_supply_demand
+from application.ledger import Ledger
+from application.snapshot import MarketHistory
+from application.algorithms.market import predict_external_price, predict_supply_demand, has_converged
+from application.algorithms.shifting import LoadShifter
+from application.algorithms.forecast import precompute_forecasts
 from core.external_power_grid import ExternalPowerGrid
 
 
-MAX_ROUND = 5
+MIN_ROUND = 2
+MAX_ROUND = 10  # round budget of an hour
+PRICE_TOLERANCE = 0.01  # relative change of the clearing price between two rounds
+VOLUME_TOLERANCE = 0.02  # volume of a round relative to the volume cleared so far in the hour
+MIN_AMOUNT = 1e-6  # smaller bids are rounding residue of earlier fills and are not put on the book
 
 
 class DSM:  # Demand side management
-    def __init__(self, external: ExternalPowerGrid):
-        self._market_information = {}
+    def __init__(self, external: ExternalPowerGrid, forecaster='holt_winters', window=None):
+        self._market_information = {}  # hours in run order
+        self.window = max(window, 2) if window else None  # bounded mode, hours kept, the previous one is needed
         self.external = external
+        self.forecaster = forecaster  # see application.algorithms.forecast.FORECASTERS
+        self.forecast_table = None  # precomputed (hours x 24) forecasts, see precompute_forecasts
 
     def market_information(self, datetime: Schedule):
         if (datetime.weekday, datetime.hour) not in self._market_information:
             self._market_information[(datetime.weekday, datetime.hour)] = self.predict_market(datetime)
+            if self.window and len(self._market_information) > self.window:
+                del self._market_information[next(iter(self._market_information))]  # oldest hour
 
         return self._market_information[(datetime.weekday, datetime.hour)]
 
@@ -40,11 +53,13 @@ class DSM:  # Demand side management
         # external_price_hour
         predict_market.external_price_hour = self.external.curr_price(datetime)
         # external_price_day = [...history_data, ...predict_data]
-        offset = datetime.hour+1
-        history_data = self.external.get_history_data(datetime)
-        predict_data = predict_external_price(np.arange(1, len(history_data) + 1), history_data, 24 - offset)
-        predict_market.external_price_day = np.concatenate((history_data[-offset:], predict_data))
-        self.external.compare_prices(datetime, predict_market.external_price_day)
+        if self.forecast_table is not None:
+            predict_market.external_price_day = self.forecast_table[datetime.index].copy()
+        else:
+            offset = datetime.hour+1
+            history_data = self.external.get_history_data(datetime)
+            predict_data = predict_external_price(history_data, 24 - offset, self.forecaster)
+            predict_market.external_price_day = np.concatenate((history_data[-offset:], predict_data))
 
         return predict_market
 
@@ -83,19 +98,32 @@ class DSM:  # Demand side management
 class DMS:  # Distribution management systems
     def __init__(self, microgrids: Microgrids):
         self.microgrids = microgrids
+        self.ledger = Ledger()
 
     def distribute_energy(self, trade_list: list[Trade], datetime: Schedule):
         for trade in trade_list:
-            self.microgrids.power_flow(trade, datetime)
+            flow = self.microgrids.power_flow(trade, datetime)
+            if flow > 0:
+                self.ledger.post(trade, flow)  # settled at the end of the round
 
 
 class TradingPlatform:
-    def __init__(self, microgrids: Microgrids):
+    def __init__(self, microgrids: Microgrids, forecaster='holt_winters', window=None, shared=False):
         self.microgrids = microgrids
-        self.market_manager = DSM(self.microgrids.external)
+        self.market_manager = DSM(self.microgrids.external, forecaster, window)
         self.allocator = DMS(microgrids)
         self.users = {}
+        self.min_round = MIN_ROUND
         self.max_round = MAX_ROUND
+        self.rounds_used = np.zeros(HORIZON, dtype=int)
+        self.load_shifter = LoadShifter()
+        self.market_history = MarketHistory(shared=shared)  # the one market history every user reads
+        self.recorder = None  # application.replay.Recorder, captures the order books of every round
+        self.feeders = None  # application.feeder.FeederClearing, nets every feeder before the central book
+
+    def precompute_forecasts(self, workers=None, cache_dir=None):
+        self.market_manager.forecast_table = precompute_forecasts(
+            self.microgrids.external, self.market_manager.forecaster, workers, cache_dir)
 
     def register_user(self, user: User):
         self.users[user.user_id] = user
@@ -105,11 +133,17 @@ class TradingPlatform:
     def handle(self, datetime: Schedule):
         round_number = 1
         last_round = False
+        converged = False
         supply_list = []
         demand_list = []
+        pre_price = None
+        total_volume = 0
+        curr_market = self.market_manager.market_information(datetime)
+        self.microgrids.dispatch_ess(datetime, curr_market.external_price_day)  # plan storage by forecast import prices
         while last_round is False:
-            if round_number == self.max_round:
+            if round_number == self.max_round or converged:  # settle in the next round
                 last_round = True
+            self.rounds_used[datetime.index] = round_number
 
             self.notify_market(datetime, round_number, last_round)  # notify user
 
@@ -117,24 +151,71 @@ class TradingPlatform:
             if len(demand_list) == 0 or len(supply_list) == 0:
                 break
 
-            supply_list = sorted(copy.deepcopy(supply_list), key=lambda x: x.price)
-            demand_list = sorted(copy.deepcopy(demand_list), key=lambda x: x.price, reverse=True)
-
-            trade_list = self.match_trades(datetime, supply_list, demand_list, last_round)  # trade matching
+            if self.recorder is not None:
+                self.recorder.record_books(datetime, round_number, last_round, self.microgrids.import_price(datetime),
+                                           supply_list, demand_list)
+            trade_list, supply_list, demand_list = self.clear(datetime, supply_list, demand_list, last_round)
+            if self.recorder is not None:
+                self.recorder.record_trades(trade_list)
             self.allocator.distribute_energy(trade_list, datetime)  # distribute energy by trade
             self.market_manager.record_market(datetime, trade_list)  # record trade
 
             self.market_manager.adjust_market(datetime, round_number)
+            self.allocator.ledger.settle()
+
+            volume = sum(trade.amount for trade in trade_list)
+            price, spread = self.quote(datetime, supply_list, demand_list)
+            if volume > 0:
+                price = sum(trade.amount * trade.price for trade in trade_list) / volume
+            elif price is None:  # one side is empty
+                price = pre_price
+            total_volume += volume
+            converged = round_number >= self.min_round and has_converged(
+                pre_price, price, volume, total_volume, PRICE_TOLERANCE, VOLUME_TOLERANCE, spread)
+            pre_price = price
             round_number += 1
 
         self.finishing_touches(datetime, supply_list, demand_list)
+        self.allocator.ledger.settle()
+
+    def quote(self, datetime: Schedule, supply_list: list[Trade], demand_list: list[Trade]):
+        """Mid quote and spread of a residual book, bids above the import price cannot be served"""
+        if len(supply_list) == 0 or len(demand_list) == 0:
+            return None, None
+        ask = supply_list[0].price
+        bid = min(demand_list[0].price, self.microgrids.import_price(datetime))
+        return (ask + bid) / 2, ask - bid
+
+    def round_stats(self):
+        rounds = self.rounds_used[self.rounds_used > 0]
+        return {
+            'hours': len(rounds),
+            'mean': float(rounds.mean()) if len(rounds) > 0 else 0,
+            'max': int(rounds.max()) if len(rounds) > 0 else 0,
+            'at_budget': int((rounds == self.max_round).sum()),
+            'histogram': np.bincount(rounds, minlength=self.max_round + 1)[1:].tolist(),
+        }
+
+    def close(self):
+        for user in self.users.values():
+            user.update_market_information(None, None)  # drop the views before the buffer goes
+        self.market_history.close()
 
     def notify_market(self, datetime: Schedule, round_number, last: bool):
         curr_market = self.market_manager.market_information(datetime)
         curr_market.round_number = round_number
         curr_market.last = last
+        if round_number == 1:  # forecast is updated once per hour
+            curr_market.load_shares = self.load_shifter.update(
+                self.microgrids.import_price_day(curr_market.external_price_day), datetime.hour)
+            curr_market.price_floor = self.microgrids.export_price(datetime)
+            curr_market.price_cap = self.microgrids.import_price(datetime)
+        index = round_number - 1
+        snapshot = self.market_history.publish(
+            datetime, round_number, last, curr_market.supply_demand_ratio[index], curr_market.prices[index],
+            curr_market.price_floor, curr_market.price_cap, curr_market.external_price_day, curr_market.load_shares)
         for user in self.users.values():
-            user.update_market_information(datetime, curr_market)
+            user.update_market_information(datetime, snapshot)
 
     def get_supply_demand_list(self, datetime: Schedule):
         total_supply_list, total_demand_list, total_trade_list = [], [], []
@@ -142,6 +223,8 @@ class TradingPlatform:
         total_demand = 0
         for user in self.users.values():
             supply_list, demand_list, trade_list = user.get_supply_demand(datetime)
+            supply_list = [supply for supply in supply_list if supply.amount >= MIN_AMOUNT]
+            demand_list = [demand for demand in demand_list if demand.amount >= MIN_AMOUNT]
             for supply in supply_list:
                 total_supply += supply.amount
             for demand in demand_list:
@@ -160,8 +243,20 @@ class TradingPlatform:
 
         return total_supply_list, total_demand_list
 
-    def match_trades(self, datetime: Schedule, supply_list: list[Trade], demand_list: list[Trade], last: bool):
-        max_price = self.microgrids.external.curr_price(datetime)
+    def clear(self, datetime: Schedule, supply_list: list[Trade], demand_list: list[Trade], last: bool,
+              max_price=None):
+        if self.feeders is not None:
+            return self.feeders.clear(self.match_trades, datetime, supply_list, demand_list, last, max_price)
+        supply_list = sorted(copy.deepcopy(supply_list), key=lambda x: x.price)
+        demand_list = sorted(copy.deepcopy(demand_list), key=lambda x: x.price, reverse=True)
+
+        trade_list = self.match_trades(datetime, supply_list, demand_list, last, max_price)  # trade matching
+        return trade_list, supply_list, demand_list
+
+    def match_trades(self, datetime: Schedule, supply_list: list[Trade], demand_list: list[Trade], last: bool,
+                     max_price=None):
+        if max_price is None:
+            max_price = self.microgrids.import_price(datetime)
 
         trade_list = []
         while supply_list and demand_list:
@@ -200,23 +295,40 @@ class TradingPlatform:
         return trade_list
 
     def finishing_touches(self, datetime: Schedule, supply_list: list[Trade], demand_list: list[Trade]):
+        # surplus charges the storage, what it cannot take is exported
         trade_list = []
+        export_list = []
+        free = self.microgrids.ess_free()
         for supply in supply_list:
-            price = 0
-            trade_list.append(Trade(
-                amount=supply.amount,
-                price=price,
-                supplier_id=supply.supplier_id,
-                supplier_device_id=supply.supplier_device_id,
-                consumer_id=self.microgrids.name,
-                consumer_device_id=self.microgrids.ess_id,
-                mode=TradeMode.TO_ESS
-            ))
+            amount = min(supply.amount, free)
+            free -= amount
+            if amount > 0:
+                trade_list.append(Trade(
+                    amount=amount,
+                    price=0,
+                    supplier_id=supply.supplier_id,
+                    supplier_device_id=supply.supplier_device_id,
+                    consumer_id=self.microgrids.name,
+                    consumer_device_id=self.microgrids.ess_id,
+                    mode=TradeMode.TO_ESS
+                ))
+            if supply.amount > amount:
+                export_list.append(Trade(
+                    amount=supply.amount - amount,
+                    price=self.microgrids.export_price(datetime),
+                    supplier_id=supply.supplier_id,
+                    supplier_device_id=supply.supplier_device_id,
+                    consumer_id=self.microgrids.external.name,
+                    consumer_device_id=self.microgrids.external.name,
+                    mode=TradeMode.TO_EXTERNAL
+                ))
+        trade_list += self.microgrids.export_energy(export_list, datetime)  # curtailed by the PCC capacity
 
         self.allocator.distribute_energy(trade_list, datetime)
         self.market_manager.record_market(datetime, trade_list)
 
         final_supply_list = self.microgrids.get_supply(datetime)
+        trade_list = []
         index = 0
         while demand_list:
             supply = final_supply_list[index]
@@ -242,5 +354,20 @@ class TradingPlatform:
             else:
                 demand_list[0] = demand.refresh_amount(demand.amount-amount)
 
+        trade_list = self.microgrids.import_energy(trade_list, datetime)  # curtailed by the PCC capacity
         self.allocator.distribute_energy(trade_list, datetime)
         self.market_manager.record_market(datetime, trade_list)
+
+        charge = self.microgrids.ess_charge_demand(datetime)  # storage charging planned from the grid
+        if charge > 0:
+            trade_list = self.microgrids.import_energy([Trade(
+                amount=charge,
+                price=self.microgrids.import_price(datetime),
+                supplier_id=self.microgrids.external.name,
+                supplier_device_id=self.microgrids.external.name,
+                consumer_id=self.microgrids.name,
+                consumer_device_id=self.microgrids.ess_id,
+                mode=TradeMode.GRID_TO_ESS
+            )], datetime)
+            self.allocator.distribute_energy(trade_list, datetime)
+            self.market_manager.record_market(datetime, trade_list)
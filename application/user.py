@@ -1,9 +1,10 @@
 import copy
+import numpy as np
 
 from core.base import Schedule
 from core.device import Device, DeviceMode
 from application.base import Trade, TradeMode
-from application.base import MarketInformation
+from application.snapshot import MarketSnapshot
 from application.algorithms.user import predict_prices
 
 
@@ -11,19 +12,17 @@ class User:
     def __init__(self, user_id, device_list: list[Device]):
         self.user_id = user_id
         self.device_list = device_list
-        self.selling_price_range = (25, 99)
-        self.purchase_price_range = (1, 75)
-        self._market = {}
+        self._market = None  # read-only view of the shared market history
+        self._targets = {}  # deferrable device id -> (hour index, demand at hour start, hourly target)
 
-    def update_market_information(self, datetime: Schedule, data: MarketInformation):
-        self._market[(datetime.weekday, datetime.hour)] = data
+    def update_market_information(self, datetime: Schedule, data: MarketSnapshot):
+        self._market = data
 
-    def get_market_information(self, datetime: Schedule):
-        return self._market[(datetime.weekday, datetime.hour)]
+    def get_market_information(self, datetime: Schedule) -> MarketSnapshot:
+        return self._market
 
     def get_supply_demand(self, datetime: Schedule) -> (list[Trade], list[Trade], list[Trade]):
         curr_market = self.get_market_information(datetime)
-        index = curr_market.round_number-1
         # get supply and demand
         supply_list = self.get_supply(datetime)
         demand_list = self.get_demand(datetime)
@@ -37,7 +36,8 @@ class User:
         self_ratio = 1
         if self_demand > 0:
             self_ratio = self_supply/self_demand
-        sell, buy = predict_prices(curr_market.supply_demand_ratio[index], curr_market.prices[index], self_ratio)
+        sell, buy = predict_prices(curr_market.supply_demand_ratio, curr_market.price, self_ratio)
+        sell, buy = np.clip([sell, buy], curr_market.price_floor, curr_market.price_cap)  # within the tariffs
         # determine trade
         trade_self_list = []
         if sell < buy:
@@ -95,21 +95,32 @@ class User:
         return supply_list
 
     def get_demand(self, datetime: Schedule):
-        curr_market = self._market[(datetime.weekday, datetime.hour)]
-        prices = copy.deepcopy(curr_market.external_price_day[datetime.hour:])
-        min_hour = min(range(len(prices)), key=lambda i: prices[i])
+        curr_market = self.get_market_information(datetime)
         demand_list = []
         for device in self.device_list:
             amount = device.demand(datetime)
             if amount == 0:
                 continue
-            data = {
+            if device.mode() == DeviceMode.ONCE:
+                amount = self.deferred_demand(datetime, device, amount, curr_market)  # the cheapest hours only
+                if amount == 0:
+                    continue
+            demand_list.append({
                 'id': device.device_id,
-                'demand': device.demand(datetime),
-            }
-            if device.mode() == DeviceMode.IMMEDIATE or device.mode() == DeviceMode.PERSIST:
-                demand_list.append(data)
-            elif min_hour == datetime.hour:
-                demand_list.append(data)
+                'demand': amount,
+            })
 
         return demand_list
+
+    def deferred_demand(self, datetime: Schedule, device: Device, amount, curr_market: MarketSnapshot):
+        """
+        Part of the hourly target of a deferrable device not charged yet. The target is fixed
+        on the first round of the hour, the share of the demand at hour start.
+        """
+        index, start, target = self._targets.get(device.device_id, (None, 0, 0))
+        if index != datetime.index:
+            start = amount
+            target = amount * curr_market.load_share(getattr(device, 'charge_hours', 1))
+            self._targets[device.device_id] = (datetime.index, start, target)
+
+        return max(target - (start - amount), 0)
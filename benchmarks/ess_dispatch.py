@@ -0,0 +1,37 @@
+import time
+import numpy as np
+from application.algorithms.storage import solve_dispatch, ESSDispatcher
+
+
+def bench_solve(horizon, batch, repeat=5, cap=100000, levels=101):
+    rng = np.random.default_rng(0)
+    prices = rng.uniform(80, 160, size=(batch, horizon))
+    step = cap / (levels - 1)
+    terminal_value = np.arange(levels) * step * prices.min()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        solve_dispatch(prices, levels, step, cap * 0.25, 0.95, 0.9, terminal_value)
+    return (time.perf_counter() - start) / repeat
+
+
+def bench_rolling(horizon, repeat=5, cap=100000):
+    """Roll the schedule hour by hour, the forecast of the last hour changes each time"""
+    rng = np.random.default_rng(0)
+    prices = rng.uniform(80, 160, size=horizon)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        dispatcher = ESSDispatcher(cap)
+        energy = cap * 0.5
+        for hour in range(horizon):
+            prices[-1] = rng.uniform(80, 160)
+            energy += dispatcher.plan(prices, hour, energy) * 0.95
+    return (time.perf_counter() - start) / repeat / horizon
+
+
+if __name__ == '__main__':
+    print(f'{"horizon":>8} {"solve (ms)":>12} {"batch 100 (ms)":>16} {"rolling/hour (ms)":>19}')
+    for horizon in (24, 48, 96, 168, 336):
+        single = bench_solve(horizon, 1)
+        batch = bench_solve(horizon, 100, repeat=1)
+        rolling = bench_rolling(horizon, repeat=1)
+        print(f'{horizon:>8} {single * 1000:>12.2f} {batch * 1000:>16.2f} {rolling * 1000:>19.2f}')
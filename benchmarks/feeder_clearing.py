@@ -0,0 +1,45 @@
+import sys
+import time
+from core.base import Schedule, HOURS_PER_DAY
+from core.microgrids import Microgrids
+from application.trading_platform import TradingPlatform
+from application.replay import Recorder
+from application.feeder import FeederClearing
+
+
+def clear_all(platform: TradingPlatform, recorder: Recorder):
+    """Clear every captured order book, return the time, cleared volume and volume weighted price"""
+    elapsed, volume, value = 0, 0, 0
+    for captured in recorder.rounds:
+        datetime = Schedule(captured['index'] // HOURS_PER_DAY, captured['index'] % HOURS_PER_DAY)
+        start = time.perf_counter()
+        trade_list, _, _ = platform.clear(datetime, captured['supply'], captured['demand'], captured['last'],
+                                          captured['max_price'])
+        elapsed += time.perf_counter() - start
+        volume += sum(trade.amount for trade in trade_list)
+        value += sum(trade.amount * trade.price for trade in trade_list)
+    return elapsed, volume, value / volume if volume > 0 else 0
+
+
+if __name__ == '__main__':
+    file_path = sys.argv[1] if len(sys.argv) > 1 else 'energy_flow_trace.pkl'
+    recorder = Recorder.load(file_path)
+    feeders = recorder.feeders
+    if len(sys.argv) > 2 or not feeders:  # users dealt round robin into the given number of feeders
+        count = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+        users = sorted({bid.supplier_id for captured in recorder.rounds for bid in captured['supply']} |
+                       {bid.consumer_id for captured in recorder.rounds for bid in captured['demand']})
+        feeders = {user_id: f'feeder{i % count + 1}' for i, user_id in enumerate(users)}
+
+    platform = TradingPlatform(Microgrids('group8'))  # matching engine only, max price comes from the trace
+    flat = clear_all(platform, recorder)
+    platform.feeders = FeederClearing(feeders)
+    tiered = clear_all(platform, recorder)
+    platform.close()
+
+    print(f'rounds: {len(recorder.rounds)}, feeders: {len(set(feeders.values()))}')
+    for name, (elapsed, volume, price) in (('flat', flat), ('feeders', tiered)):
+        print(f'{name:>8}: {elapsed * 1000:.1f} ms, volume {volume:.0f}, price {price:.2f}')
+    stats = platform.feeders.stats()
+    print(f"central book: {stats['central_bids']} of {stats['device_bids']} bids ({stats['reduction']:.1f}x smaller)")
+    print(f'volume change: {tiered[1] / flat[1] - 1:.2%}' if flat[1] > 0 else 'no volume')
@@ -0,0 +1,18 @@
+import sys
+import warnings
+from core.base import HORIZON, HOURS_PER_DAY
+from core.external_power_grid import ExternalPowerGrid
+from application.algorithms.forecast import FORECASTERS, backtest
+
+
+if __name__ == '__main__':
+    step = int(sys.argv[1]) if len(sys.argv) > 1 else 1  # forecast origin every step hours
+    names = sys.argv[2].split(',') if len(sys.argv) > 2 else list(FORECASTERS)
+    warnings.filterwarnings('ignore')  # statsmodels convergence warnings
+
+    history = ExternalPowerGrid().history()
+    start = len(history) - HORIZON  # replay the simulated week, as DSM sees it after every hour
+    origins = [start + hour + 1 for hour in range(0, HORIZON, step) if (hour + 1) % HOURS_PER_DAY != 0]
+    report = backtest(history, origins, names)
+    print(f'{len(origins)} forecasts, the rest of the day each')
+    print(report.to_string(index=False, float_format=lambda x: f'{x:.3f}'))
@@ -0,0 +1,47 @@
+import sys
+import time
+import numpy as np
+from application.base import Trade, TradeMode
+from application.ledger import Ledger
+
+
+def bench(users, rounds, trades_per_round):
+    rng = np.random.default_rng(0)
+    names = [f'user{i}' for i in range(users)]
+    modes = list(TradeMode)
+    ledger = Ledger()
+    post_time = settle_time = 0
+    for _ in range(rounds):
+        trade_list = [Trade(
+            amount=amount,
+            price=price,
+            supplier_id=names[supplier],
+            consumer_id=names[consumer],
+            mode=modes[mode],
+        ) for amount, price, supplier, consumer, mode in zip(
+            rng.uniform(1, 500, trades_per_round), rng.uniform(50, 150, trades_per_round),
+            rng.integers(users, size=trades_per_round), rng.integers(users, size=trades_per_round),
+            rng.integers(len(modes), size=trades_per_round))]
+        start = time.perf_counter()
+        for trade in trade_list:
+            ledger.post(trade, trade.amount)
+        post_time += time.perf_counter() - start
+        start = time.perf_counter()
+        ledger.settle()
+        settle_time += time.perf_counter() - start
+
+    start = time.perf_counter()
+    statements = ledger.statements()
+    statement_time = time.perf_counter() - start
+    assert abs(statements['balance'].sum()) < 1e-6 * statements['paid'].sum()  # double entry nets to zero
+
+    return post_time / ledger.posted * 1e6, settle_time / rounds * 1000, statement_time
+
+
+if __name__ == '__main__':
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    post, settle, statement = bench(users, rounds=20, trades_per_round=users)
+    print(f'users: {users}')
+    print(f'post per trade: {post:.2f} us')
+    print(f'settle per round: {settle:.2f} ms')
+    print(f'statements: {statement:.2f} s')
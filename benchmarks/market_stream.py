@@ -0,0 +1,61 @@
+import os
+import csv
+import sys
+import time
+import asyncio
+from core.base import Schedule
+from core.microgrids import Microgrids
+from application.base import Trade
+from application.trading_platform import TradingPlatform
+from application.market_service import MarketService, Side
+
+
+def load_orders(file_path):
+    """Turn every logged trade into an ask of its supplier and a bid of its consumer, grouped by hour"""
+    hours = []
+    curr_datetime = None
+    with open(file_path, encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            if row['datetime'] != curr_datetime:
+                curr_datetime = row['datetime']
+                weekday, hour = curr_datetime.split(':')
+                hours.append((Schedule(int(weekday), int(hour)), []))
+            amount = float(row['amount'])
+            price = float(row['price'])
+            hours[-1][1].append((Side.ASK, Trade(
+                amount=amount,
+                price=price * 0.95,
+                supplier_id=row['supplier_id'],
+                supplier_device_id=row['supplier_device_id'])))
+            hours[-1][1].append((Side.BID, Trade(
+                amount=amount,
+                price=price * 1.05,
+                consumer_id=row['consumer_id'],
+                consumer_device_id=row['consumer_device_id'])))
+    return hours
+
+
+async def replay(service: MarketService, hours, repeat=1):
+    service.start()
+    count = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for datetime, orders in hours:
+            await service.advance(datetime)
+            for side, order in orders:
+                await service.submit(side, order)
+            count += len(orders)
+    await service.stop()
+    return count / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    file_path = sys.argv[1] if len(sys.argv) > 1 else 'energy_flow_output.csv'
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    platform = TradingPlatform(Microgrids('group8'))  # no registered devices, only the matching engine is measured
+    service = MarketService(platform)
+    orders_per_second = asyncio.run(replay(service, load_orders(os.path.abspath(file_path)), repeat))
+    platform.close()
+    print(f'orders per second: {orders_per_second:.0f}')
+    for key, value in service.stats().items():
+        print(f'{key}: {value:.3f}' if isinstance(value, float) else f'{key}: {value}')
@@ -0,0 +1,58 @@
+import os
+import sys
+import tempfile
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from utils.memory import MemoryReport, peak_rss
+
+
+def measure(hours, bounded, trace, scale):
+    """One run of the given length in this (fresh) process, peak RSS and the traced memory by subsystem"""
+    import main
+    report = MemoryReport()
+    if trace:
+        report.start()
+    with tempfile.TemporaryDirectory() as directory, open(os.devnull, 'w') as devnull, \
+            contextlib.redirect_stdout(devnull):
+        microgrids, platform = main.setup(bounded, os.path.join(directory, 'store'), scale)
+        os.chdir(directory)  # part files stay out of the repo, the caches are already read
+        main.run(platform, hours)
+        microgrids.close()
+        platform.close()
+        result = {'hours': hours, 'bounded': bounded, 'peak_rss_mb': peak_rss()}
+        if trace:
+            result.update(report.summary())
+            result['subsystems'] = report.take().head(8)
+            report.stop()
+
+    return result
+
+
+def isolated(hours, bounded, trace, scale):
+    # spawn, a forked child would inherit the peak RSS of this process
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(measure, hours, bounded, trace, scale).result()
+
+
+if __name__ == '__main__':
+    horizons = [int(hours) for hours in sys.argv[1:] if hours.isdigit()] or [24, 84, 168]
+    trace = '--trace' in sys.argv  # several times slower
+    scale = int(os.environ.get('SCALE', 10))  # copies of every user of device.xml
+    tolerance = 0.05  # peak RSS growth over the horizons allowed in bounded mode
+
+    results = {}
+    for bounded in (False, True):
+        for hours in horizons:
+            result = isolated(hours, bounded, trace, scale)
+            results[(bounded, hours)] = result['peak_rss_mb']
+            print(f"{'bounded' if bounded else 'unbounded'} {hours:>4}h: peak RSS {result['peak_rss_mb']:.1f} MB" +
+                  (f", traced {result['traced_mb']:.1f} MB (peak {result['traced_peak_mb']:.1f} MB)" if trace else ''))
+            if trace:
+                print(result['subsystems'].to_string(index=False))
+
+    for bounded in (False, True):
+        growth = results[(bounded, horizons[-1])] / results[(bounded, horizons[0])] - 1
+        print(f"{'bounded' if bounded else 'unbounded'} growth {horizons[0]}h -> {horizons[-1]}h: {growth:.1%}")
+    growth = results[(True, horizons[-1])] / results[(True, horizons[0])] - 1
+    assert growth <= tolerance, f'peak RSS of the bounded mode grows by {growth:.1%} with the horizon'
@@ -0,0 +1,23 @@
+import sys
+from core.microgrids import Microgrids
+from application.trading_platform import TradingPlatform
+from application.replay import Recorder, replay
+from application.feeder import FeederClearing
+
+
+if __name__ == '__main__':
+    file_path = sys.argv[1] if len(sys.argv) > 1 else 'energy_flow_trace.pkl'
+    tolerance = float(sys.argv[2]) if len(sys.argv) > 2 else 1e-6
+    recorder = Recorder.load(file_path)
+    platform = TradingPlatform(Microgrids('group8'))  # the engine under test, max price comes from the trace
+    if recorder.feeders:
+        platform.feeders = FeederClearing(recorder.feeders)
+    report, elapsed = replay(recorder, platform, atol=tolerance)
+    platform.close()
+    print(f'seed: {recorder.seed}, rounds: {len(recorder.rounds)}, replayed in {elapsed:.3f} s')
+    if len(report) == 0:
+        print('all rounds match')
+    else:
+        print(f'{len(report)} rounds differ')
+        print(report.to_string(index=False))
+        sys.exit(1)
@@ -1,6 +1,11 @@
 from enum import IntEnum
 
 
+HOURS_PER_DAY = 24
+DAYS = 7
+HORIZON = DAYS * HOURS_PER_DAY  # simulated hours
+
+
 class Schedule:
     def __init__(self, weekday=0, hour=0):
         self._weekday = weekday
@@ -14,12 +19,16 @@ class Schedule:
     def hour(self):
         return self._hour
 
+    @property
+    def index(self):
+        return self._weekday * HOURS_PER_DAY + self._hour
+
     def next(self):
         if self.has_next() is False:
             return
         self._hour += 1
-        self._weekday += self._hour // 24
-        self._hour = self._hour % 24
+        self._weekday += self._hour // HOURS_PER_DAY
+        self._hour = self._hour % HOURS_PER_DAY
 
         return self
 
@@ -27,13 +36,13 @@ class Schedule:
         if self.has_pre() is False:
             return
         self._hour -= 1
-        self._weekday += self._hour // 24
-        self._hour = self._hour % 24
+        self._weekday += self._hour // HOURS_PER_DAY
+        self._hour = self._hour % HOURS_PER_DAY
 
         return self
 
     def has_next(self):
-        if self._weekday < 6 or self._hour < 23:
+        if self._weekday < DAYS - 1 or self._hour < HOURS_PER_DAY - 1:
             return True
         return False
 
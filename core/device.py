@@ -1,8 +1,7 @@
-import uuid
 import random
 import numpy as np
 from enum import Enum
-from core.base import Energy, Schedule, EnergyMode
+from core.base import Energy, Schedule, EnergyMode, DAYS, HOURS_PER_DAY
 
 
 class DeviceMode(Enum):
@@ -28,11 +27,14 @@ class Device(Energy):
 
 
 class SolarPanels(Device):
-    def __init__(self, device_id):
+    def __init__(self, device_id, profile=None):
         super().__init__(device_id, "solar panels")
-        self.init()
+        self.init(profile)
 
-    def init(self):
+    def init(self, profile=None):
+        if profile is not None:  # sampled with the whole fleet, see core.profiles
+            self._energy = np.asarray(profile, dtype=float).reshape(DAYS, HOURS_PER_DAY).copy()
+            return
         self._energy = np.full((7, 24), 0)
         offset = random.randint(7, 13)
         duration = random.randint(4, 6)
@@ -56,8 +58,9 @@ class SolarPanels(Device):
 
 
 class EV(Device):
-    def __init__(self, device_id):
+    def __init__(self, device_id, charge_hours=1):
         super().__init__(device_id, "electric vehicles")
+        self.charge_hours = charge_hours  # charging is spread over the cheapest hours of the day
         self.init()
 
     def init(self):
@@ -83,11 +86,14 @@ class EV(Device):
 
 
 class Appliances(Device):
-    def __init__(self, device_id):
+    def __init__(self, device_id, profile=None):
         super().__init__(device_id, "appliances")
-        self.init()
+        self.init(profile)
 
-    def init(self):
+    def init(self, profile=None):
+        if profile is not None:  # sampled with the whole fleet, see core.profiles
+            self._demand = np.asarray(profile, dtype=float).reshape(DAYS, HOURS_PER_DAY).copy()
+            return
         per_cost = random.randint(50, 200)
         self._demand = np.full((7, 24), per_cost)
 
@@ -142,14 +148,17 @@ class Other(Device):
         return diff
 
 
-def convert_to_device(config, name):
-    device_id = f'{name}:{str(uuid.uuid4())[:6]}'
+def convert_to_device(config, name, profile=None):
+    device_id = f'{name}:{random.getrandbits(24):06x}'  # follows the seed of random, runs can be replayed
     if name == 'solar_panels':
-        device = SolarPanels(device_id)
+        device = SolarPanels(device_id, profile)
     elif name == 'ev':
-        device = EV(device_id)
+        charge_hours = 1
+        if name in config:
+            charge_hours = int(config[name].get('charge_hours', 1))
+        device = EV(device_id, charge_hours)
     elif name == 'appliances':
-        device = Appliances(device_id)
+        device = Appliances(device_id, profile)
     else:
         demand, frequency = 20, 24 * 7
         if name in config:
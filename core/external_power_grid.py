@@ -2,8 +2,7 @@ import os
 import sys
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from core.base import Schedule
+from core.base import Schedule, DAYS
 from collections import defaultdict
 
 
@@ -36,14 +35,21 @@ class ExternalPowerGrid:
         hour = datetime.hour
         return self._prices[weekday][hour]
 
+    def prices(self):
+        return np.array(self._prices[:DAYS], dtype=float).ravel()  # price of every simulated hour
+
     @staticmethod
     def supply(_):
         return sys.float_info.max
 
-    def allocate(self, target, demand, datetime: Schedule):
-        self._bill[target] += demand * self.curr_price(datetime)
+    def allocate(self, target, demand, datetime: Schedule, price=None):
+        price = self.curr_price(datetime) if price is None else price  # tariff price of the trade, if given
+        self._bill[target] += demand * price
         return demand
 
+    def history(self):
+        return np.array([price for daily in self._history_prices for price in daily], dtype=float)
+
     def get_history_data(self, datetime: Schedule):
         weekday = datetime.weekday + 14
         data_list = []
@@ -51,13 +57,3 @@ class ExternalPowerGrid:
             data_list.extend(daily)
         data_list.extend(self._history_prices[weekday][:datetime.hour+1])
         return data_list
-
-    def compare_prices(self, datetime: Schedule, predict):
-        test = True
-        if test:
-            return
-        actual = self._prices[datetime.weekday]
-        plt.plot(np.arange(len(actual)), actual, label='Actual')
-        plt.plot(np.arange(len(predict)), predict, label='Predict', color='red')
-        plt.legend()
-        plt.show()
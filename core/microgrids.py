@@ -1,25 +1,43 @@
+import sys
+import numpy as np
 from utils.printer import Printer
+from utils.metrics import Metrics
+from utils.trade_store import TradeStore
 from core.device import Device, DeviceMode
-from core.base import EnergyMode, Schedule
+from core.base import EnergyMode, Schedule, HORIZON
 from application.base import Trade
 from core.external_power_grid import ExternalPowerGrid
+from core.tariff import Tariff, TariffTable
+from application.algorithms.storage import ESSDispatcher
 
 
 class ESS(Device):  # Energy storage system
-    def __init__(self, cap):
+    def __init__(self, cap, efficiency=0.95):
         super().__init__('ESS', 'energy storage system')
         self._cap = cap
         self._energy = cap*0.5
+        self.efficiency = efficiency  # one-way efficiency of charge and discharge
 
-    def supply(self, _):
+    @property
+    def cap(self):
+        return self._cap
+
+    @property
+    def energy(self):  # stored energy, before the discharge efficiency
         return self._energy
 
+    def supply(self, _):
+        return self._energy * self.efficiency
+
+    def free(self):
+        return (self._cap - self._energy) / self.efficiency
+
     def charge(self, _, amount):
-        self._energy = min(self._energy + amount, self._cap)  # no more than capacity
+        self._energy = min(self._energy + amount * self.efficiency, self._cap)  # no more than capacity
 
     def discharge(self, _, amount):
-        diff = min(amount, self._energy)  # no less than 0
-        self._energy -= diff
+        diff = min(amount, self._energy * self.efficiency)  # no less than 0
+        self._energy -= diff / self.efficiency
 
         return diff
 
@@ -31,30 +49,68 @@ class ESS(Device):  # Energy storage system
 
 
 class PCC:  # Point of common coupling
-    def __init__(self, name, external):
+    def __init__(self, name, external, import_capacity=sys.float_info.max, export_capacity=sys.float_info.max,
+                 tariffs: TariffTable = None):
         self._name = name
         self._external = external
-        self._record = []
+        self._tariffs = tariffs  # bills the exchange like the trades, the raw grid price without it
+        self.import_capacity = import_capacity  # feeder/transformer limit per hour
+        self.export_capacity = export_capacity
+        self._record = np.zeros((HORIZON, 2))  # imported and exported energy of every hour
+
+    def exchange(self, amounts, datetime: Schedule):
+        """
+        Import a batch of demands at once, curtailed pro rata when the capacity left in this hour is exceeded.
+        """
+        return self._transfer(amounts, datetime, 0, self.import_capacity)
+
+    def export(self, amounts, datetime: Schedule):
+        exported = self._transfer(amounts, datetime, 1, self.export_capacity)
+        price = self._tariffs.export_at(datetime) if self._tariffs is not None else None
+        self._external.allocate(self._name, -exported.sum(), datetime, price)  # sold to the grid
 
-    def exchange(self, amount):
-        if amount < 0:
-            return 0
-        demand = self._external.allocate(self._name, amount)
-        self._record.append(demand)
-        return demand
+        return exported
+
+    def _transfer(self, amounts, datetime: Schedule, direction, capacity):
+        amounts = np.maximum(np.asarray(amounts, dtype=float), 0)
+        total = amounts.sum()
+        available = max(capacity - self._record[datetime.index, direction], 0)
+        if total > available:
+            amounts *= available / total
+            total = available
+        if direction == 0 and total > 0:
+            price = self._tariffs.import_at(datetime) if self._tariffs is not None else None
+            self._external.allocate(self._name, total, datetime, price)
+        self._record[datetime.index, direction] += total
+
+        return amounts
+
+    def imports(self):
+        return self._record[:, 0]
+
+    def exports(self):
+        return self._record[:, 1]
 
 
 class Microgrids:
-    def __init__(self, name):
+    def __init__(self, name, store_path=None, import_capacity=sys.float_info.max, export_capacity=sys.float_info.max,
+                 tariff: Tariff = None, spill_dir=None, window=None):
         self.name = name
+        self.tariff = tariff or Tariff()
         self._ess = ESS(100000)
         self.ess_id = self._ess.device_id
+        self._ess_dispatcher = ESSDispatcher(self._ess.cap, efficiency=self._ess.efficiency,
+                                             sell_ratio=self.tariff.ess_ratio)
+        self._ess_plan = 0  # grid side energy of the current hour, positive to charge and negative to discharge
         self.external = ExternalPowerGrid()
-        self.external_pcc = PCC(name, self.external)
+        self.tariffs = TariffTable([self.tariff], self.external.prices())
+        self.external_pcc = PCC(name, self.external, import_capacity, export_capacity, self.tariffs)
         self.DERs = {}  # distributed energy resources
         self.consumers = {}
         self.register(self._ess)
-        self.printer = Printer()
+        self.printer = Printer(spill_dir, window=window)  # bounded mode, flows spilled and a window of the graph
+        self.metrics = Metrics()
+        self.trade_store = TradeStore(store_path) if store_path else None
 
     def register(self, device: Device):
         if device.energy_mode() & EnergyMode.Producer == EnergyMode.Producer:
@@ -67,45 +123,110 @@ class Microgrids:
         dst_id = trade.consumer_device_id
         amount = trade.amount
 
-        if dst_id not in self.consumers:
-            return 'device not found'
-        consumer = self.consumers[dst_id]
+        if dst_id == self.external.name:
+            consumer = None  # already exported through the PCC, see export_energy
+        elif dst_id in self.consumers:
+            consumer = self.consumers[dst_id]
+        else:
+            return 0  # device not found
 
         if src_id in self.DERs:
             producer = self.DERs[src_id]
             flow = producer.discharge(datetime, amount)
         elif src_id == self.external.name:
-            flow = self.external.allocate(self.name, amount, datetime)
+            flow = amount  # already imported through the PCC, see import_energy
         else:
-            return 'device not found'
-        consumer.charge(datetime, flow)
+            return 0  # device not found
+        if consumer is not None:
+            consumer.charge(datetime, flow)
         data = trade.to_json()
+        data['amount'] = flow  # delivered energy, the same in every log, the metrics and the ledger
         data['datetime'] = f'{datetime.weekday}:{datetime.hour}'
+        data['day'] = datetime.weekday
+        data['hour'] = datetime.hour
         self.printer.add_data(data)
+        self.metrics.add(trade, datetime, flow)
+        if self.trade_store is not None:
+            self.trade_store.append(data)
         # power from src to dst
         print(f'[{trade.mode.name}] {src_id} provide {flow} units of electricity energy to {dst_id}')
 
+        return flow
+
+    def import_energy(self, trade_list: list[Trade], datetime: Schedule) -> list[Trade]:
+        imports = [i for i, trade in enumerate(trade_list) if trade.supplier_device_id == self.external.name]
+        if len(imports) == 0:
+            return trade_list
+        amounts = self.external_pcc.exchange([trade_list[i].amount for i in imports], datetime)
+        trade_list = list(trade_list)
+        for i, amount in zip(imports, amounts):
+            trade_list[i] = trade_list[i].refresh_amount(amount)
+
+        return [trade for trade in trade_list if trade.amount > 0]
+
+    def export_energy(self, trade_list: list[Trade], datetime: Schedule) -> list[Trade]:
+        exports = [i for i, trade in enumerate(trade_list) if trade.consumer_device_id == self.external.name]
+        if len(exports) == 0:
+            return trade_list
+        amounts = self.external_pcc.export([trade_list[i].amount for i in exports], datetime)
+        trade_list = list(trade_list)
+        for i, amount in zip(exports, amounts):
+            trade_list[i] = trade_list[i].refresh_amount(amount)
+
+        return [trade for trade in trade_list if trade.amount > 0]
+
+    def ess_free(self):
+        return self._ess.free()
+
+    def dispatch_ess(self, datetime: Schedule, prices):
+        self._ess_plan = self._ess_dispatcher.plan(self.import_price_day(prices), datetime.hour, self._ess.energy)
+
+    def ess_charge_demand(self, _):
+        return min(max(self._ess_plan, 0), self._ess.free())
+
+    def import_price(self, datetime: Schedule):
+        return self.tariffs.import_at(datetime)
+
+    def import_price_day(self, prices):
+        return self.tariffs.import_day(prices)
+
+    def export_price(self, datetime: Schedule):
+        return self.tariffs.export_at(datetime)
+
     def get_supply(self, datetime: Schedule) -> list[dict]:
         supply_list = [{
-                'amount': self._ess.supply(datetime),
-                'price': self.external.curr_price(datetime) * 0.9,
+                'amount': min(self._ess.supply(datetime), max(-self._ess_plan, 0)),
+                'price': self.tariffs.ess_at(datetime),
                 'supplier_id': self.name,
                 'supplier_device_id': self.ess_id
             },
             {
                 'amount': self.external.supply(datetime),
-                'price': self.external.curr_price(datetime),
+                'price': self.tariffs.import_at(datetime),
                 'supplier_id': self.external.name,
                 'supplier_device_id': self.external.name
             }]
 
         return supply_list
 
+    def close(self):
+        if self.trade_store is not None:
+            self.trade_store.seal()
+
     def print_flow(self, datetime: Schedule):
-        self.printer.print_by_datetime_and_user(f'{datetime.weekday}:{datetime.hour}')
+        self.printer.print_by_datetime_and_user(datetime.index)
+
+    def export_flows(self, directory, fmt='png'):
+        return self.printer.export_flows(directory, fmt)
 
     def print_by_mode(self):
-        self.printer.print_by_mode()
+        self.printer.print_by_mode(self.metrics.mode_counts())
 
     def print_into_excel(self):
         self.printer.print_into_excel()
+
+    def print_into_parquet(self):
+        self.printer.print_into_parquet()
+
+    def print_summary(self):
+        self.metrics.save('energy_flow_summary.npz')
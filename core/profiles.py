@@ -0,0 +1,96 @@
+import os
+import json
+import hashlib
+import numpy as np
+from dataclasses import dataclass, asdict
+from core.base import DAYS, HOURS_PER_DAY
+
+
+@dataclass(frozen=True)
+class SolarProfile:
+    peak: tuple = (240, 270)  # output of a panel at noon on a clear day (300W * 0.8~0.9)
+    sunrise: tuple = (6.0, 8.0)
+    sunset: tuple = (17.0, 20.0)
+    clear_sky: float = 0.7  # probability of a clear day, weather is shared by the whole fleet
+    cloudy: tuple = (0.2, 0.7)  # output factor of a cloudy day
+    spread: float = 0.05  # panel to panel variation of the daily factor
+
+
+@dataclass(frozen=True)
+class LoadProfile:
+    base: tuple = (50, 200)  # average consumption per hour
+    morning: float = 0.4  # height of the morning peak relative to the average
+    evening: float = 0.8  # height of the evening peak relative to the average
+    night: float = 0.4  # depth of the night valley relative to the average
+    noise: float = 0.1
+
+
+def _gauss(hours, center, width):
+    return np.exp(-0.5 * ((hours - center) / width) ** 2)
+
+
+class ProfileGenerator:
+    """
+    Samples the hourly profiles of a whole fleet as one (n_devices, hours) array with a seeded Generator.
+    Profiles are cached on disk by a hash of the parameters, the fleet size and the seed.
+    """
+    def __init__(self, seed=0, cache_dir=None):
+        self.seed = seed
+        self.cache_dir = cache_dir
+
+    def solar(self, n, params=SolarProfile()):
+        return self._cached('solar', n, params, self._solar)
+
+    def load(self, n, params=LoadProfile()):
+        return self._cached('load', n, params, self._load)
+
+    def _cached(self, kind, n, params, generate):
+        key = json.dumps({'kind': kind, 'n': n, 'seed': self.seed, 'params': asdict(params)}, sort_keys=True)
+        digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+        file_path = os.path.join(self.cache_dir, f'{kind}_{digest}.npy') if self.cache_dir else None
+        if file_path and os.path.exists(file_path):
+            return np.load(file_path)
+
+        profiles = generate(np.random.default_rng([self.seed, len(kind), n]), n, params)
+        if file_path:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            np.save(file_path, profiles)
+
+        return profiles
+
+    @staticmethod
+    def _solar(rng, n, params: SolarProfile):
+        hours = np.arange(HOURS_PER_DAY) + 0.5
+        sunrise = rng.uniform(*params.sunrise, size=(n, 1))
+        sunset = rng.uniform(*params.sunset, size=(n, 1))
+        shape = np.sin(np.pi * np.clip((hours - sunrise) / (sunset - sunrise), 0, 1))  # (n, 24)
+
+        weather = np.where(rng.random(DAYS) < params.clear_sky, 1.0, rng.uniform(*params.cloudy, size=DAYS))
+        daily = np.clip(weather * rng.normal(1, params.spread, size=(n, DAYS)), 0, 1)  # (n, days)
+        peak = rng.uniform(*params.peak, size=(n, 1, 1))
+
+        return (peak * daily[:, :, None] * shape[:, None, :]).reshape(n, DAYS * HOURS_PER_DAY)
+
+    @staticmethod
+    def _load(rng, n, params: LoadProfile):
+        hours = np.arange(HOURS_PER_DAY)
+        curve = 1 + params.morning * _gauss(hours, 7.5, 1.5) + params.evening * _gauss(hours, 19.5, 2) \
+            - params.night * _gauss(hours, 3, 2)
+        curve /= curve.mean()
+        base = rng.uniform(*params.base, size=(n, 1))
+        noise = rng.lognormal(0, params.noise, size=(n, DAYS * HOURS_PER_DAY))
+
+        return base * np.tile(curve, DAYS) * noise
+
+
+def sample_fleet(generator: ProfileGenerator, counts: dict):
+    """
+    Profiles of all devices of the fleet, by device name, one row per device.
+    """
+    fleet = {}
+    if counts.get('solar_panels', 0) > 0:
+        fleet['solar_panels'] = iter(generator.solar(counts['solar_panels']))
+    if counts.get('appliances', 0) > 0:
+        fleet['appliances'] = iter(generator.load(counts['appliances']))
+
+    return fleet
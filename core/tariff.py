@@ -0,0 +1,96 @@
+import numpy as np
+from dataclasses import dataclass
+from core.base import Schedule, DAYS, HOURS_PER_DAY
+
+
+@dataclass(frozen=True)
+class Tariff:
+    name: str = 'dynamic'
+    import_rate: tuple = None  # time-of-use energy price of each hour of day, None follows the grid price
+    import_markup: float = 1.0  # share of the grid price paid on a dynamic tariff
+    export_ratio: float = 0.5  # feed-in price as share of the grid price
+    network_fee: float = 0.0  # added to every imported unit
+    ess_ratio: float = 0.9  # ESS ask as share of the import price
+
+    @staticmethod
+    def time_of_use(name, peak, off_peak, peak_hours=(8, 20), **kwargs):
+        import_rate = tuple(peak if peak_hours[0] <= hour < peak_hours[1] else off_peak for hour in range(24))
+        return Tariff(name, import_rate, **kwargs)
+
+    @staticmethod
+    def from_config(config: dict):
+        """
+        A <peak>/<off_peak> pair (with optional <peak_hours>, e.g. 8,20) defines a time-of-use tariff,
+        an <import_rate> list of 24 prices a fixed one, otherwise the tariff follows the grid price.
+        """
+        kwargs = dict(
+            import_markup=float(config.get('import_markup', 1.0)),
+            export_ratio=float(config.get('export_ratio', 0.5)),
+            network_fee=float(config.get('network_fee', 0.0)),
+            ess_ratio=float(config.get('ess_ratio', 0.9)),
+        )
+        name = config.get('name', 'dynamic')
+        if config.get('peak'):
+            peak_hours = tuple(int(hour) for hour in config.get('peak_hours', '8,20').split(','))
+            return Tariff.time_of_use(name, float(config['peak']), float(config['off_peak']), peak_hours, **kwargs)
+        import_rate = None
+        if config.get('import_rate'):
+            import_rate = tuple(float(rate) for rate in config['import_rate'].split(','))
+            if len(import_rate) != HOURS_PER_DAY:
+                raise ValueError(f'import_rate of tariff {name} needs {HOURS_PER_DAY} hourly prices')
+        return Tariff(name, import_rate, **kwargs)
+
+
+class TariffTable:
+    """
+    Tariff schemes compiled ahead of the run into dense (hour x tariff) price tables.
+    Pricing a trade is an array lookup, many schemes can be compiled at once for batch runs.
+    """
+    def __init__(self, tariffs: list[Tariff], grid_prices):
+        self.tariffs = tariffs
+        self.names = [tariff.name for tariff in tariffs]
+        grid_prices = np.asarray(grid_prices, dtype=float)[:, None]  # (hours, 1)
+
+        markup = np.array([tariff.import_markup for tariff in tariffs])
+        fixed = np.array([tariff.import_rate is not None for tariff in tariffs])
+        rate = np.array([np.tile(tariff.import_rate, DAYS) if tariff.import_rate is not None
+                         else np.zeros(len(grid_prices)) for tariff in tariffs]).T
+        network_fee = np.array([tariff.network_fee for tariff in tariffs])
+
+        self.import_price = np.where(fixed, rate, grid_prices * markup) + network_fee
+        self.export_price = grid_prices * np.array([tariff.export_ratio for tariff in tariffs])
+        self.ess_price = self.import_price * np.array([tariff.ess_ratio for tariff in tariffs])
+
+    def bill(self, imports, exports=None):
+        """
+        Net cost of hourly imports/exports (hours,) or (runs, hours) under every tariff at once.
+        """
+        cost = np.asarray(imports) @ self.import_price
+        if exports is not None:
+            cost -= np.asarray(exports) @ self.export_price
+
+        return cost
+
+    def import_day(self, prices, tariff=0):
+        """
+        Import prices of a day of (forecast) grid prices under the tariff, what the planners should see.
+        """
+        scheme = self.tariffs[tariff]
+        if scheme.import_rate is not None:
+            day = np.array(scheme.import_rate, dtype=float)
+        else:
+            day = np.asarray(prices, dtype=float) * scheme.import_markup
+
+        return day + scheme.network_fee
+
+    def index(self, name):
+        return self.names.index(name)
+
+    def import_at(self, datetime: Schedule, tariff=0):
+        return self.import_price[datetime.index, tariff]
+
+    def export_at(self, datetime: Schedule, tariff=0):
+        return self.export_price[datetime.index, tariff]
+
+    def ess_at(self, datetime: Schedule, tariff=0):
+        return self.ess_price[datetime.index, tariff]
@@ -1,19 +1,61 @@
 import os
+import sys
+import random
+import numpy as np
+from collections import Counter
 from utils.config import ConfigLoader
 from core.base import Schedule
 from core.device import convert_to_device
+from core.profiles import ProfileGenerator, sample_fleet
 from core.microgrids import Microgrids
+from core.tariff import Tariff
 from application.user import User
 from application.trading_platform import TradingPlatform
+from application.replay import Recorder
+from application.feeder import FeederClearing
 
 
-if __name__ == '__main__':
+SEED = 8
+WINDOW = 24  # hours of market history and flow graph kept in bounded mode
+
+
+def setup(bounded=False, store_path='energy_flow_store', scale=1):
+    """
+    Build the platform of device.xml. In bounded mode the flows are spilled to energy_flow_output/,
+    only a rolling window of the market history is kept and the order books are not captured.
+    scale > 1 clones every user of the config, for larger populations, with a copy of the feeders of the config.
+    """
+    random.seed(SEED)
+    np.random.seed(SEED)
     config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'application/device.xml')
     config = ConfigLoader(config_path).json()
+    feeders = FeederClearing.from_config(config['feeder']).feeders if 'feeder' in config else None
+    if scale > 1:
+        config['user'] = {f'{user_id}_{copy}': devices for user_id, devices in config['user'].items()
+                          for copy in range(scale)}
+        if feeders:
+            feeders = {f'{user_id}_{copy}': f'{feeder}_{copy}' for user_id, feeder in feeders.items()
+                       for copy in range(scale)}
 
     # prepare platform
-    microgrids = Microgrids('group8')  # build microgrids
-    platform = TradingPlatform(microgrids)  # load platform
+    pcc = config['pcc']  # feeder limits per hour
+    microgrids = Microgrids('group8', store_path,
+                            float(pcc['import_capacity']), float(pcc['export_capacity']),
+                            Tariff.from_config(config['tariff']),
+                            spill_dir='energy_flow_output' if bounded else None,
+                            window=WINDOW if bounded else None)  # build microgrids
+    platform = TradingPlatform(microgrids, window=WINDOW if bounded else None)  # load platform
+    if feeders:
+        platform.feeders = FeederClearing(feeders)  # users are cleared feeder by feeder first
+    if not bounded:
+        platform.recorder = Recorder(SEED, feeders)  # capture the order books, see benchmarks/replay_diff.py
+
+    # sample the profiles of the whole fleet at once
+    counts = Counter()
+    for devices in config['user'].values():
+        for device, count in devices.items():
+            counts[device] += int(count)
+    fleet = sample_fleet(ProfileGenerator(seed=SEED, cache_dir='.cache/profiles'), counts)
 
     # register user
     for user_id in config['user']:
@@ -22,16 +64,45 @@ if __name__ == '__main__':
         for device in devices:
             count = int(config['user'][user_id][device])
             for _ in range(count):
-                device_list.append(convert_to_device(config, device))
+                profile = next(fleet[device]) if device in fleet else None
+                device_list.append(convert_to_device(config, device, profile))
         platform.register_user(User(user_id, device_list))
 
-    # start
+    # forecast every hour of the run up front, in parallel
+    platform.precompute_forecasts(cache_dir='.cache/forecasts')
+
+    return microgrids, platform
+
+
+def run(platform: TradingPlatform, hours=None):
     datetime = Schedule()
-    while True:
+    hour = 0
+    while hours is None or hour < hours:
         print(f'-------- weekday: {datetime.weekday}, hour: {datetime.hour} --------')
         platform.handle(datetime)
+        hour += 1
         if datetime.has_next() is False:
             break
         datetime.next()
 
-    microgrids.print_into_excel()
+
+if __name__ == '__main__':
+    bounded = '--bounded' in sys.argv
+    microgrids, platform = setup(bounded)
+
+    # start
+    run(platform)
+    microgrids.close()
+    platform.close()
+    print(f'rounds per hour: {platform.round_stats()}')
+    if platform.feeders is not None:
+        print(f'order book size: {platform.feeders.stats()}')
+
+    if bounded:
+        microgrids.print_into_parquet()
+    else:
+        platform.recorder.save('energy_flow_trace.pkl')
+        microgrids.print_into_excel()
+        microgrids.print_into_parquet()
+    microgrids.print_summary()
+    platform.allocator.ledger.statements().to_csv('energy_flow_statements.csv', index=False)
@@ -1,27 +1,62 @@
+import os
+import numpy as np
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
+from utils.analytics import TradeLog
 
-file_path = 'energy_flow_output.csv'
+file_path = 'energy_flow_output.csv'  # the sample log
+log_paths = [
+    'energy_flow_output.parquet',
+    'energy_flow_output',  # part files of a bounded run
+    'energy_flow_output.typed.csv',  # written without a parquet engine
+]
+summary_path = 'energy_flow_summary.npz'
 
-data = pd.read_csv(file_path)
-
-def preprocess_datetime_column(data):
+class LogSummary(dict):
     """
-    Splits the 'datetime' column into separate 'day' and 'hour' columns.
-    Assumes the format is 'day:hour'.
+    Aggregates of a trade log, each one is streamed from the log on first use.
+    Only the columns an aggregate needs are read.
     """
-    data[['day', 'hour']] = data['datetime'].str.split(':', expand=True).astype(int)
-    return data
+    queries = {
+        'total_supply': lambda log: log.sum_by(['supplier_id']),
+        'hourly_supply': lambda log: log.sum_by(['hour', 'supplier_id']),
+        'mode_amount': lambda log: log.sum_by(['mode']).set_index('mode')['amount'],
+    }
+
+    def __init__(self, log):
+        super().__init__()
+        self.log = log
+
+    def __missing__(self, key):
+        self[key] = self.queries[key](self.log)
+        return self[key]
 
-data = preprocess_datetime_column(data)
+def load_summary(summary_path):
+    """
+    Loads the running totals written by the simulation (Metrics.save), no trade is scanned.
+    """
+    summary = np.load(summary_path)
+    names = summary['names']
+    hours_per_day = int(summary['hours_per_day'])
+    supply = summary['supply']
+    suppliers = supply.sum(axis=0) > 0
+    hourly = supply[:, suppliers].reshape(-1, hours_per_day, suppliers.sum()).sum(axis=0)
+    return {
+        'total_supply': pd.DataFrame({'supplier_id': names[suppliers], 'amount': supply[:, suppliers].sum(axis=0)}),
+        'hourly_supply': pd.DataFrame({
+            'hour': np.repeat(np.arange(hours_per_day), suppliers.sum()),
+            'supplier_id': np.tile(names[suppliers], hours_per_day),
+            'amount': hourly.ravel(),
+        }),
+        'mode_amount': pd.Series(summary['mode_amount'].sum(axis=0), index=summary['modes']),
+    }
 
 sns.set_theme(style="whitegrid")
 
 # Total Energy Supplied by Source
-def total_energy_supplied_by_source(data):
-    total_supply = data.groupby('supplier_id')['amount'].sum().reset_index()
-    total_supply = total_supply.sort_values(by='amount', ascending=False)
+def total_energy_supplied_by_source(summary):
+    total_supply = summary['total_supply'].sort_values(by='amount', ascending=False)
     plt.figure(figsize=(12, 7))
     sns.barplot(x='amount', y='supplier_id', data=total_supply, palette='viridis', legend=False)
     plt.title('Total Energy Supplied by Source', fontsize=18)
@@ -31,8 +66,8 @@ def total_energy_supplied_by_source(data):
     plt.show()
 
 # Hourly Trends of Energy Supply
-def hourly_energy_trends(data):
-    hourly_supply = data.groupby(['hour', 'supplier_id'])['amount'].sum().reset_index()
+def hourly_energy_trends(summary):
+    hourly_supply = summary['hourly_supply']
     plt.figure(figsize=(14, 8))
     sns.lineplot(x='hour', y='amount', hue='supplier_id', data=hourly_supply, palette='tab10', marker='o')
     plt.title('Hourly Trends of Energy Supply', fontsize=18)
@@ -44,8 +79,8 @@ def hourly_energy_trends(data):
     plt.show()
 
 # Energy Contribution Percentage by Source
-def energy_contribution_percentage(data):
-    total_supply = data.groupby('supplier_id')['amount'].sum().reset_index()
+def energy_contribution_percentage(summary):
+    total_supply = summary['total_supply'].copy()
     total_supply['percentage'] = (total_supply['amount'] / total_supply['amount'].sum()) * 100
 
     plt.figure(figsize=(10, 10))
@@ -57,11 +92,11 @@ def energy_contribution_percentage(data):
     plt.show()
 
 # Grid Dependency Plot
-def grid_dependency_plot(data):
+def grid_dependency_plot(summary):
     """
     Plots the grid dependency as a percentage of total supply.
     """
-    total_supply = data.groupby('supplier_id')['amount'].sum().reset_index()
+    total_supply = summary['total_supply']
     total_grid_supply = total_supply[total_supply['supplier_id'] == 'MainGrid']['amount'].sum()
     total_energy = total_supply['amount'].sum()
 
@@ -84,12 +119,13 @@ def grid_dependency_plot(data):
         print("Error: Invalid total_grid_supply or total_energy")
         print(f"Total Grid Supply: {total_grid_supply}, Total Energy: {total_energy}")
 
-def self_sufficiency_ratio_plot(data):
+def self_sufficiency_ratio_plot(summary):
     """
     Plots the self-sufficiency ratio (percentage of demand met by internal sources).
     """
-    internal_supply = data[data['mode'].isin(['SELF_USE', 'TO_ESS'])]['amount'].sum()
-    total_demand = data['amount'].sum()
+    mode_amount = summary['mode_amount']
+    internal_supply = mode_amount[mode_amount.index.isin(['SELF_USE', 'TO_ESS'])].sum()  # not GRID_TO_ESS
+    total_demand = mode_amount[~mode_amount.index.isin(['TO_EXTERNAL'])].sum()  # exports serve no demand
 
     print("Internal Supply:", internal_supply)
     print("Total Demand:", total_demand)
@@ -107,8 +143,15 @@ def self_sufficiency_ratio_plot(data):
         print("Error: Invalid internal_supply or total_demand")
         print(f"Internal Supply: {internal_supply}, Total Demand: {total_demand}")
 
-total_energy_supplied_by_source(data)
-hourly_energy_trends(data)
-energy_contribution_percentage(data)
-grid_dependency_plot(data)
-self_sufficiency_ratio_plot(data)
+if __name__ == '__main__':
+    if os.path.exists(summary_path):
+        summary = load_summary(summary_path)
+    else:
+        log_path = next((path for path in log_paths if os.path.exists(path)), file_path)
+        summary = LogSummary(TradeLog(log_path))
+
+    total_energy_supplied_by_source(summary)
+    hourly_energy_trends(summary)
+    energy_contribution_percentage(summary)
+    grid_dependency_plot(summary)
+    self_sufficiency_ratio_plot(summary)
@@ -0,0 +1,36 @@
+import os
+import contextlib
+import pytest
+import main
+from benchmarks.memory_bound import isolated
+from utils.memory import peak_rss
+
+
+HOURS = (24, 168)
+SCALE = 10  # large enough that the unbounded stores outgrow the interpreter and the caches
+TOLERANCE = 0.05
+
+
+def test_bounded_stores_stay_capped(tmp_path, monkeypatch):
+    microgrids, platform = main.setup(True, str(tmp_path / 'store'))
+    monkeypatch.chdir(tmp_path)  # spilled part files
+    microgrids.printer.chunk_rows = 100
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        main.run(platform, 48)
+    microgrids.close()
+    platform.close()
+
+    assert len(microgrids.printer.data) < 100
+    assert len(platform.market_manager._market_information) <= main.WINDOW
+    assert sum(1 for hour in range(48) if microgrids.printer.flow_graph.edges(hour)) <= main.WINDOW
+    assert len(microgrids.printer.frame()) == microgrids.metrics.mode_count.sum()  # nothing lost by spilling
+
+
+@pytest.mark.skipif(peak_rss() is None, reason='peak RSS is not available on this platform')
+def test_peak_rss_stays_flat_in_bounded_mode_only():
+    growth = {}
+    for bounded in (False, True):
+        short, long = (isolated(hours, bounded, False, SCALE)['peak_rss_mb'] for hours in HOURS)
+        growth[bounded] = long / short - 1
+    assert growth[True] <= TOLERANCE
+    assert growth[False] > TOLERANCE  # the test tells the modes apart
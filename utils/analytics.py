@@ -0,0 +1,85 @@
+import os
+import operator
+import pandas as pd
+
+try:
+    import pyarrow.dataset as ds
+except ImportError:  # parquet logs need pyarrow, csv logs are read with pandas only
+    ds = None
+
+
+OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+
+class TradeLog:
+    """
+    Streams a trade log (parquet or csv) chunk by chunk, only the requested columns are read.
+    file_path is one file or the directory of part files spilled by a bounded run.
+    filters: list of (column, op, value), op is one of OPERATORS or 'in'.
+    On parquet the filters are pushed down to the scanner, row groups out of range are skipped.
+    """
+    def __init__(self, file_path, chunksize=1000000):
+        self.file_path = file_path
+        self.chunksize = chunksize
+        if os.path.isdir(file_path):
+            self.files = sorted(os.path.join(file_path, name) for name in os.listdir(file_path)
+                                if name.endswith(('.parquet', '.csv')))
+        else:
+            self.files = [file_path]
+        self.parquet = all(os.path.splitext(path)[1] == '.parquet' for path in self.files)
+        if self.parquet and ds is None:
+            raise ImportError('pyarrow is required to read parquet trade logs')
+
+    def chunks(self, columns, filters=None):
+        filters = filters or []
+        columns = list(dict.fromkeys(columns + [column for column, _, _ in filters]))
+        if self.parquet:
+            yield from self._parquet_chunks(columns, filters)
+        else:
+            yield from self._csv_chunks(columns, filters)
+
+    def _parquet_chunks(self, columns, filters):
+        expression = None
+        for column, op, value in filters:
+            field = ds.field(column)
+            condition = field.isin(value) if op == 'in' else OPERATORS[op](field, value)
+            expression = condition if expression is None else expression & condition
+        dataset = ds.dataset(self.files, format='parquet')
+        for batch in dataset.to_batches(columns=columns, filter=expression, batch_size=self.chunksize):
+            yield batch.to_pandas()
+
+    def _csv_chunks(self, columns, filters):
+        for file_path in self.files:  # the sample log, a .typed.csv log or its part files
+            header = pd.read_csv(file_path, nrows=0, encoding='utf-8-sig').columns
+            derived = [column for column in ('day', 'hour') if column in columns and column not in header]
+            usecols = [column for column in columns if column not in derived]
+            if derived:  # logs written before the typed columns existed
+                usecols.append('datetime')
+            for chunk in pd.read_csv(file_path, usecols=usecols, chunksize=self.chunksize, encoding='utf-8-sig'):
+                if derived:
+                    day_hour = chunk['datetime'].str.split(':', expand=True).astype('int16')
+                    chunk['day'], chunk['hour'] = day_hour[0], day_hour[1]
+                for column, op, value in filters:
+                    mask = chunk[column].isin(value) if op == 'in' else OPERATORS[op](chunk[column], value)
+                    chunk = chunk[mask]
+                yield chunk[columns]
+
+    def sum_by(self, keys, value='amount', filters=None):
+        """
+        Group sum in bounded memory, only one chunk and the partial sums are held at a time.
+        """
+        result = None
+        for chunk in self.chunks(keys + [value], filters):
+            partial = chunk.groupby(keys)[value].sum()
+            result = partial if result is None else result.add(partial, fill_value=0)
+        if result is None:
+            return pd.DataFrame(columns=keys + [value])
+
+        return result.reset_index()
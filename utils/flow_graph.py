@@ -0,0 +1,90 @@
+import os
+import networkx as nx
+import matplotlib.pyplot as plt
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from core.base import HORIZON, HOURS_PER_DAY
+
+
+class FlowGraph:
+    """
+    Energy flow edges indexed by simulated hour.
+    Edges are aggregated at device or user level, groups maps a user to a coarser node (e.g. its microgrid).
+    The layout is computed once over all nodes ever seen and reused for every hour.
+    With a window, the edges of older hours are dropped and only their totals stay in the layout weights.
+    """
+    def __init__(self, level='user', groups=None, horizon=HORIZON, window=None):
+        self.level = level
+        self.groups = groups or {}
+        self.window = window  # bounded mode, only the edges of the last window hours are kept
+        self._edges = [defaultdict(float) for _ in range(horizon)]
+        self._kept_from = 0
+        self._weights = defaultdict(float)  # total amount of every edge, drives the layout
+        self._nodes = set()
+        self._layout = None
+
+    def add(self, data):
+        if self.level == 'device':
+            src, dst = data['supplier_device_id'], data['consumer_device_id']
+        else:
+            src, dst = self.groups.get(data['supplier_id'], data['supplier_id']), \
+                       self.groups.get(data['consumer_id'], data['consumer_id'])
+        hour = data['day'] * HOURS_PER_DAY + data['hour']
+        if src not in self._nodes or dst not in self._nodes:
+            self._nodes.update((src, dst))
+            self._layout = None  # new node, layout is computed again on next use
+        self._edges[hour][(src, dst)] += data['amount']
+        self._weights[(src, dst)] += data['amount']
+        if self.window and hour - self.window >= self._kept_from:
+            for old in range(self._kept_from, hour - self.window + 1):
+                self._edges[old].clear()
+            self._kept_from = hour - self.window + 1
+
+    def edges(self, hour):
+        return self._edges[hour]
+
+    def layout(self, seed=8):
+        if self._layout is None:
+            G = nx.DiGraph()
+            G.add_nodes_from(sorted(self._nodes))
+            G.add_weighted_edges_from((src, dst, amount) for (src, dst), amount in self._weights.items())
+            self._layout = nx.spring_layout(G, seed=seed)
+        return self._layout
+
+    def draw(self, hour):
+        return draw_flow(hour, dict(self._edges[hour]), self.layout())
+
+    def export(self, directory, fmt='png', hours=None, workers=None):
+        """
+        Renders the given hours (all by default) into directory without a display, in parallel.
+        """
+        os.makedirs(directory, exist_ok=True)
+        hours = range(len(self._edges)) if hours is None else hours
+        layout = self.layout()
+        jobs = [(hour, dict(self._edges[hour]), layout, os.path.join(directory, f'flow_{hour:03d}.{fmt}'))
+                for hour in hours if self._edges[hour]]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(_render, jobs))
+
+
+def draw_flow(hour, edges, layout):
+    G = nx.DiGraph()
+    G.add_weighted_edges_from((src, dst, round(amount, 1)) for (src, dst), amount in edges.items())
+    pos = {node: layout[node] for node in G.nodes}
+    fig = plt.figure(figsize=(10, 7))
+    nx.draw(G, pos, with_labels=True, node_size=500, node_color='lightblue', font_size=10)
+    labels = nx.get_edge_attributes(G, 'weight')
+    nx.draw_networkx_edge_labels(G, pos, edge_labels=labels)
+    plt.title(f'energy flow - {hour // HOURS_PER_DAY}:{hour % HOURS_PER_DAY}')
+
+    return fig
+
+
+def _render(job):
+    hour, edges, layout, output_file = job
+    plt.switch_backend('Agg')
+    fig = draw_flow(hour, edges, layout)
+    fig.savefig(output_file)
+    plt.close(fig)
+
+    return output_file
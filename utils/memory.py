@@ -0,0 +1,64 @@
+import os
+import tracemalloc
+import pandas as pd
+from collections import defaultdict
+
+try:
+    import resource
+except ImportError:  # not on windows
+    resource = None
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def peak_rss():
+    """Peak resident set size of this process in MB, None where it is not available"""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB on linux
+
+
+def subsystem(traceback):
+    """Module of this repo that made the allocation, e.g. utils/printer, the innermost repo frame wins"""
+    for frame in reversed(traceback):
+        file_path = os.path.abspath(frame.filename)
+        if file_path.startswith(ROOT) and 'site-packages' not in file_path:
+            return os.path.splitext(os.path.relpath(file_path, ROOT))[0]
+    return 'other'
+
+
+class MemoryReport:
+    """
+    Memory held by every subsystem, from tracemalloc allocations attributed to the repo module
+    that made them (also through numpy, pandas or the standard library).
+    """
+    def __init__(self, frames=8):
+        self.frames = frames
+
+    def start(self):
+        tracemalloc.start(self.frames)
+
+    @staticmethod
+    def stop():
+        tracemalloc.stop()
+
+    @staticmethod
+    def take():
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ))
+        sizes = defaultdict(lambda: [0, 0])
+        for stat in snapshot.statistics('traceback'):
+            size = sizes[subsystem(stat.traceback)]
+            size[0] += stat.size
+            size[1] += stat.count
+        report = pd.DataFrame([(name, size / 2 ** 20, count) for name, (size, count) in sizes.items()],
+                              columns=['subsystem', 'mb', 'blocks'])
+
+        return report.sort_values('mb', ascending=False, ignore_index=True)
+
+    @staticmethod
+    def summary():
+        current, peak = tracemalloc.get_traced_memory()
+        return {'traced_mb': current / 2 ** 20, 'traced_peak_mb': peak / 2 ** 20, 'peak_rss_mb': peak_rss()}
@@ -0,0 +1,85 @@
+import numpy as np
+from core.base import Schedule, HORIZON, HOURS_PER_DAY
+from application.base import Trade, TradeMode
+
+
+MODES = list(TradeMode)
+GRID_ID = 'MainGrid'
+
+
+class Metrics:
+    """
+    Running totals of the energy flows, fed trade by trade from Microgrids.power_flow.
+    Participants (users, microgrid, main grid) get a column of the preallocated arrays on first sight.
+    """
+    def __init__(self, horizon=HORIZON, size=64):
+        self._index = {}
+        self.names = []
+        self.supply = np.zeros((horizon, size))  # energy supplied by participant each hour
+        self.demand = np.zeros((horizon, size))  # energy consumed by participant each hour
+        self.supply_total = np.zeros(size)
+        self.demand_total = np.zeros(size)
+        self.mode_amount = np.zeros((horizon, len(MODES)))
+        self.mode_count = np.zeros((horizon, len(MODES)), dtype=np.int64)
+        self.total = 0
+        self.grid = 0
+        self.internal = 0
+
+    def participant(self, name):
+        if name in self._index:
+            return self._index[name]
+        column = len(self.names)
+        if column == len(self.supply_total):  # grow by doubling
+            self.supply = np.hstack((self.supply, np.zeros_like(self.supply)))
+            self.demand = np.hstack((self.demand, np.zeros_like(self.demand)))
+            self.supply_total = np.concatenate((self.supply_total, np.zeros_like(self.supply_total)))
+            self.demand_total = np.concatenate((self.demand_total, np.zeros_like(self.demand_total)))
+        self._index[name] = column
+        self.names.append(name)
+
+        return column
+
+    def add(self, trade: Trade, datetime: Schedule, flow=None):
+        hour = datetime.index
+        amount = trade.amount if flow is None else flow  # delivered energy, like the ledger
+        supplier = self.participant(trade.supplier_id)
+        consumer = self.participant(trade.consumer_id)
+        mode = MODES.index(trade.mode)
+
+        self.supply[hour, supplier] += amount
+        self.demand[hour, consumer] += amount
+        self.supply_total[supplier] += amount
+        self.demand_total[consumer] += amount
+        self.mode_amount[hour, mode] += amount
+        self.mode_count[hour, mode] += 1
+        if trade.mode != TradeMode.TO_EXTERNAL:  # exports serve no demand of the community
+            self.total += amount
+        if trade.supplier_id == GRID_ID:
+            self.grid += amount
+        if trade.mode == TradeMode.SELF_USE or trade.mode == TradeMode.TO_ESS:  # GRID_TO_ESS is grid supply
+            self.internal += amount
+
+    def grid_dependency(self):
+        return self.grid / self.total if self.total > 0 else 0
+
+    def self_sufficiency(self):
+        return self.internal / self.total if self.total > 0 else 0
+
+    def supply_by_source(self):
+        return dict(zip(self.names, self.supply_total[:len(self.names)]))
+
+    def mode_counts(self):
+        return {mode.name: int(count) for mode, count in zip(MODES, self.mode_count.sum(axis=0))}
+
+    def save(self, file_path):
+        size = len(self.names)
+        np.savez_compressed(
+            file_path,
+            names=np.array(self.names, dtype=str),
+            modes=np.array([mode.name for mode in MODES]),
+            supply=self.supply[:, :size],
+            demand=self.demand[:, :size],
+            mode_amount=self.mode_amount,
+            mode_count=self.mode_count,
+            hours_per_day=HOURS_PER_DAY,
+        )
@@ -1,44 +1,85 @@
+import os
 import pandas as pd
 import matplotlib.pyplot as plt
-import networkx as nx
+from utils.flow_graph import FlowGraph
+
+
+ROW_GROUP_SIZE = 100000
+SPILL_ROWS = 10000  # rows kept in memory in bounded mode
+FALLBACK_SUFFIX = '.typed.csv'  # written without a parquet engine, never the sample log energy_flow_output.csv
+
+
+def write_table(df, file_path, **kwargs):
+    """
+    Write file_path.parquet, or file_path.typed.csv when no parquet engine is installed.
+    Return the path written.
+    """
+    try:
+        df.to_parquet(file_path + '.parquet', index=False, **kwargs)
+        return file_path + '.parquet'
+    except ImportError:
+        df.to_csv(file_path + FALLBACK_SUFFIX, index=False)
+        return file_path + FALLBACK_SUFFIX
 
 
 class Printer:
-    def __init__(self):
+    def __init__(self, spill_dir=None, chunk_rows=SPILL_ROWS, window=None):
         self.data = []
+        self.flow_graph = FlowGraph(window=window)
+        self.spill_dir = spill_dir  # bounded mode, every chunk_rows rows are written out as one part file
+        self.chunk_rows = chunk_rows
+        self._parts = []
 
     def add_data(self, data):
         self.data.append(data)
+        self.flow_graph.add(data)
+        if self.spill_dir and len(self.data) >= self.chunk_rows:
+            self.spill()
+
+    def spill(self):
+        if len(self.data) == 0:
+            return
+        os.makedirs(self.spill_dir, exist_ok=True)
+        df = self._frame(self.data)
+        self._parts.append(write_table(df, os.path.join(self.spill_dir, f'part-{len(self._parts):05d}')))
+        self.data = []
 
-    def print_by_datetime_and_user(self, dateStr):
-        df = pd.DataFrame(self.data)
-        grouped = df.groupby('datetime')
-        for datetime, group in grouped:
-            if datetime != dateStr:
-                continue
-            G = nx.DiGraph()
-            for _, row in group.iterrows():
-                G.add_edge(row['supplier_id'], row['consumer_id'], weight=row['amount'])
-
-            pos = nx.spring_layout(G)
-            plt.figure(figsize=(10, 7))
-            nx.draw(G, pos, with_labels=True, node_size=500, node_color='lightblue', font_size=10)
-            labels = nx.get_edge_attributes(G, 'weight')
-            nx.draw_networkx_edge_labels(G, pos, edge_labels=labels)
-            plt.title(f'energy flow - {datetime}')
-            plt.show()
-
-    def print_by_mode(self):
-        df = pd.DataFrame(self.data)
-        mode_counts = df.groupby('mode')['amount'].count()
+    def frame(self):
+        """All rows, read back from the part files in bounded mode"""
+        frames = [pd.read_parquet(part) if part.endswith('.parquet') else pd.read_csv(part) for part in self._parts]
+        if len(self.data) > 0 or len(frames) == 0:
+            frames.append(self._frame(self.data))
+        return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    @staticmethod
+    def _frame(rows):
+        df = pd.DataFrame(rows)
+        return df.astype({'day': 'int16', 'hour': 'int16'}) if len(df) > 0 else df
+
+    def print_by_datetime_and_user(self, hour):
+        self.flow_graph.draw(hour)
+        plt.show()
+
+    def export_flows(self, directory, fmt='png', workers=None):
+        return self.flow_graph.export(directory, fmt, workers=workers)
+
+    @staticmethod
+    def print_by_mode(mode_counts: dict):
         plt.figure(figsize=(8, 5))
-        mode_counts.plot(kind='bar')
+        pd.Series(mode_counts).plot(kind='bar')
         plt.title('data group by mode')
         plt.ylabel('trade amount')
         plt.xlabel('trade mode')
         plt.show()
 
     def print_into_excel(self):
-        df = pd.DataFrame(self.data)
+        df = self.frame()
         output_file = "energy_flow_output.xlsx"
         df.to_excel(output_file, index=False)
+
+    def print_into_parquet(self):
+        if self.spill_dir:  # the part files already are the output
+            self.spill()
+            return self.spill_dir
+        return write_table(self._frame(self.data), "energy_flow_output",
+                           row_group_size=ROW_GROUP_SIZE)  # rows are in time order
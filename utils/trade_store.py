@@ -0,0 +1,135 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from core.base import HORIZON, HOURS_PER_DAY
+from application.base import TradeMode
+
+
+COLUMNS = {
+    'hour': np.int32,  # simulated hour, weekday * 24 + hour
+    'supplier_id': np.int32,
+    'supplier_device_id': np.int32,
+    'consumer_id': np.int32,
+    'consumer_device_id': np.int32,
+    'amount': np.float64,
+    'price': np.float64,
+    'mode': np.int8,
+}
+ID_COLUMNS = ['supplier_id', 'supplier_device_id', 'consumer_id', 'consumer_device_id']
+MODES = [mode.name for mode in TradeMode]
+
+
+class TradeStore:
+    """
+    Append-only columnar trade log on disk, rows are written as one segment per simulated hour.
+    Ids are interned into integer codes. seal() writes the hour offsets and a sorted (id, hour) index per id
+    column, a sealed store is opened with mode='r' and its columns are memory mapped, never loaded.
+    """
+    def __init__(self, directory, mode='w', horizon=HORIZON):
+        self.directory = directory
+        self.horizon = horizon
+        self._buffer = {column: [] for column in COLUMNS}
+        self._hour = 0
+        if mode == 'w':
+            os.makedirs(directory, exist_ok=True)
+            for column in COLUMNS:
+                open(self._path(column), 'wb').close()
+            self._codes = {}
+            self.names = []
+            self.rows = 0
+            self.offsets = np.zeros(horizon + 1, dtype=np.int64)  # rows of hour h are offsets[h]:offsets[h+1]
+            self.columns = None
+        else:
+            with open(self._path('names', '.json')) as f:
+                self.names = json.load(f)
+            self._codes = {name: code for code, name in enumerate(self.names)}
+            self.offsets = np.load(self._path('offsets', '.npy'))
+            self.rows = int(self.offsets[-1])
+            self.columns = {column: np.memmap(self._path(column), dtype=dtype, mode='r', shape=(self.rows,))
+                            if self.rows > 0 else np.zeros(0, dtype=dtype)
+                            for column, dtype in COLUMNS.items()}
+
+    def _path(self, name, suffix='.bin'):
+        return os.path.join(self.directory, name + suffix)
+
+    def code(self, name):
+        if name not in self._codes:
+            self._codes[name] = len(self.names)
+            self.names.append(name)
+        return self._codes[name]
+
+    def append(self, data):
+        hour = data['day'] * HOURS_PER_DAY + data['hour']
+        if hour < self._hour:
+            raise ValueError(f'trades must be appended in time order, got hour {hour} after {self._hour}')
+        if hour != self._hour:
+            self.flush()
+            self._hour = hour
+        self._buffer['hour'].append(hour)
+        for column in ID_COLUMNS:
+            self._buffer[column].append(self.code(data[column]))
+        self._buffer['amount'].append(data['amount'])
+        self._buffer['price'].append(data['price'])
+        self._buffer['mode'].append(MODES.index(data['mode']))
+
+    def flush(self):
+        count = len(self._buffer['hour'])
+        for column, dtype in COLUMNS.items():
+            with open(self._path(column), 'ab') as f:
+                np.asarray(self._buffer[column], dtype=dtype).tofile(f)
+            self._buffer[column] = []
+        self.rows += count
+        self.offsets[self._hour + 1:] = self.rows
+
+    def seal(self):
+        self.flush()
+        np.save(self._path('offsets', '.npy'), self.offsets)
+        with open(self._path('names', '.json'), 'w') as f:
+            json.dump(self.names, f)
+        hours = np.fromfile(self._path('hour'), dtype=COLUMNS['hour'])
+        for column in ID_COLUMNS:
+            key = np.fromfile(self._path(column), dtype=COLUMNS[column]).astype(np.int64) * self.horizon + hours
+            rows = np.argsort(key, kind='stable')
+            np.save(self._path(f'{column}_key', '.npy'), key[rows])
+            np.save(self._path(f'{column}_rows', '.npy'), rows)
+
+    def _index(self, column):
+        return (np.load(self._path(f'{column}_key', '.npy'), mmap_mode='r'),
+                np.load(self._path(f'{column}_rows', '.npy'), mmap_mode='r'))
+
+    def _rows(self, column, name, start, end):
+        if column is None:
+            return np.arange(self.offsets[start], self.offsets[end])
+        if name not in self._codes:
+            return np.zeros(0, dtype=np.int64)
+        key, rows = self._index(column)
+        base = self._codes[name] * self.horizon
+        left, right = np.searchsorted(key, [base + start, base + end])
+        return np.asarray(rows[left:right])
+
+    def query(self, start=0, end=None, daily=None, **ids):
+        """
+        Trades of hours [start, end), daily=(from_hour, to_hour) keeps only these hours of every day.
+        ids: equality filters on the id columns, e.g. consumer_id='user5', supplier_id='MainGrid'.
+        """
+        end = self.horizon if end is None else end
+        ranges = [(start, end)]
+        if daily is not None:
+            ranges = [(max(day + daily[0], start), min(day + daily[1], end))
+                      for day in range(0, self.horizon, HOURS_PER_DAY)]
+        column = next(iter(ids), None)
+        rows = np.concatenate([self._rows(column, ids.get(column), *r) for r in ranges if r[0] < r[1]]
+                              or [np.zeros(0, dtype=np.int64)])
+        for other, name in list(ids.items())[1:]:
+            rows = rows[self.columns[other][rows] == self._codes.get(name, -1)]
+
+        names = np.asarray(self.names, dtype=object)
+        result = {'hour': np.asarray(self.columns['hour'][rows])}
+        for id_column in ID_COLUMNS:
+            result[id_column] = names[self.columns[id_column][rows]] if len(rows) > 0 else []
+        result['amount'] = np.asarray(self.columns['amount'][rows])
+        result['price'] = np.asarray(self.columns['price'][rows])
+        result['mode'] = np.asarray(MODES, dtype=object)[self.columns['mode'][rows]] if len(rows) > 0 else []
+
+        return pd.DataFrame(result)